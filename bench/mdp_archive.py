@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from quv.mdp.archive import archive_all
+from quv.mdp.download import download_all, make_client
+from quv.utils.limiter import AdaptiveLimiter
+
+
+def start_server(count: int, size: int) -> ThreadingHTTPServer:
+    images = {f"/img{i}.jpg": os.urandom(size) for i in range(count)}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = images.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run(mode: str, urls: list[str], workdir: str) -> float:
+    start = time.perf_counter()
+    async with make_client() as client:
+        limiter = AdaptiveLimiter()
+        if mode == "files":
+            folder = os.path.join(workdir, "files")
+            os.makedirs(folder)
+            result = await download_all(client, urls, folder, limiter)
+        else:
+            path = os.path.join(workdir, f"gallery.{mode}")
+            result = await archive_all(client, urls, path, limiter, mode)
+    assert result["failed"] == 0, result["messages"][:3]
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-file vs archive download benchmark")
+    parser.add_argument("-n", dest="count", type=int, default=500)
+    parser.add_argument("-s", dest="size", type=int, default=32 * 1024)
+    parser.add_argument("-r", dest="rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_server(args.count, args.size)
+    host, port = server.server_address
+    urls = [f"http://{host}:{port}/img{i}.jpg" for i in range(args.count)]
+
+    print(f"{args.count} images x {args.size} bytes, best of {args.rounds}")
+    for mode in ("files", "zip", "tar"):
+        best = float("inf")
+        for _ in range(args.rounds):
+            with tempfile.TemporaryDirectory() as workdir:
+                best = min(best, asyncio.run(run(mode, urls, workdir)))
+        print(f"{mode:>5}: {best:.3f}s ({args.count / best:.0f} images/s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
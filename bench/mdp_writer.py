@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiofiles
+
+from quv.mdp.download import CHUNK_SIZE, download_image, make_client
+
+
+def start_server(root: str) -> tuple[subprocess.Popen, int]:
+    # 服务端放在子进程里, process_time 只统计客户端的 CPU
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "http.server", str(port), "-b", "127.0.0.1", "-d", root],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return proc, port
+
+
+async def aiofiles_download(url: str, dst: Path) -> int:
+    # 旧实现: 每个 64 KiB 块一次 aiofiles.write, 即一次线程池往返
+    total = 0
+    async with make_client() as client, client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        async with aiofiles.open(dst, "wb") as f:
+            async for chunk in resp.aiter_bytes(chunk_size=CHUNK_SIZE):
+                await f.write(chunk)
+                total += len(chunk)
+    return total
+
+
+async def buffered_download(url: str, dst: Path) -> int:
+    async with make_client() as client:
+        _, _, total = await download_image(client, url, dst)
+    return total
+
+
+def measure(fn, url: str, workdir: str) -> tuple[float, float, int]:
+    dst = Path(workdir) / "out.bin"
+    cpu, wall = time.process_time(), time.perf_counter()
+    total = asyncio.run(fn(url, dst))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    dst.unlink()
+    return cpu, wall, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="download writer CPU time per GB")
+    parser.add_argument("-s", dest="size", type=int, default=512, help="file size in MiB")
+    parser.add_argument("-r", dest="rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(root, "big.bin"), "wb") as f:
+            for _ in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+        proc, port = start_server(root)
+        url = f"http://127.0.0.1:{port}/big.bin"
+        try:
+            print(f"{args.size} MiB download, best of {args.rounds}")
+            for name, fn in (("aiofiles", aiofiles_download), ("buffered", buffered_download)):
+                best = None
+                for _ in range(args.rounds):
+                    cpu, wall, total = measure(fn, url, workdir)
+                    assert total == args.size * 1024 * 1024, total
+                    if best is None or cpu < best[0]:
+                        best = (cpu, wall)
+                cpu, wall = best
+                gib = args.size / 1024
+                print(f"{name:>8}: {cpu / gib:.2f}s CPU/GiB, {args.size / wall:.0f} MiB/s wall")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import heapq
+import itertools
+import os
+import queue
+import threading
+from collections.abc import Callable, Coroutine
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Any
+
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+MAX_ASYNC_JOBS = 4
+POLL_MS = 50
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+DoneFn = Callable[[Future], None]
+
+
+class Job:
+    def __init__(self, job_id: int, name: str, priority: int, on_done: DoneFn | None):
+        self.id = job_id
+        self.name = name
+        self.priority = priority
+        self.on_done = on_done
+        # 线程任务通过 token 协作取消, 协程任务直接取消 future
+        self.token = threading.Event()
+        self.future: Future = Future()
+
+    def cancel(self) -> None:
+        self.token.set()
+        self.future.cancel()
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+
+class TaskExecutor:
+    # QBox 持有的统一执行器: 有上限的优先级线程池 + 后台事件循环, 完成回调在 Tk 线程中执行
+    def __init__(
+        self,
+        root,
+        max_workers: int = MAX_WORKERS,
+        max_async: int = MAX_ASYNC_JOBS,
+        watchdog=None,
+    ):
+        self.root = root
+        self.watchdog = watchdog
+        self.jobs: dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._heap: list[tuple[int, int, Job, Callable, tuple, dict]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._done: queue.SimpleQueue = queue.SimpleQueue()
+        self._resources: dict[str, Any] = {}
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"quv-worker-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+        self.loop = asyncio.new_event_loop()
+        self._async_slots = asyncio.Semaphore(max_async)
+        self._loop_thread = threading.Thread(target=self._run_loop, name="quv-async", daemon=True)
+        self._loop_thread.start()
+
+        self._poll_job = root.after(POLL_MS, self._deliver)
+
+    def _new_job(self, name: str, priority: int, on_done: DoneFn | None) -> Job:
+        job = Job(next(self._ids), name, priority, on_done)
+        self.jobs[job.id] = job
+        return job
+
+    def _track(self, job: Job) -> None:
+        job.future.add_done_callback(lambda _: self._done.put(job))
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        name: str = "",
+        priority: int = PRIORITY_NORMAL,
+        on_done: DoneFn | None = None,
+        cancellable: bool = False,
+        **kwargs,
+    ) -> Job:
+        # cancellable 时以 cancel=job.token 传入, 由任务自行检查
+        job = self._new_job(name or getattr(fn, "__name__", "job"), priority, on_done)
+        if cancellable:
+            kwargs["cancel"] = job.token
+        self._track(job)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("executor is closed")
+            heapq.heappush(self._heap, (priority, next(self._seq), job, fn, args, kwargs))
+            self._cond.notify()
+        return job
+
+    def submit_async(
+        self,
+        coro: Coroutine,
+        name: str = "",
+        on_done: DoneFn | None = None,
+    ) -> Job:
+        job = self._new_job(name or getattr(coro, "__name__", "job"), PRIORITY_NORMAL, on_done)
+        job.future = asyncio.run_coroutine_threadsafe(self._guarded(coro), self.loop)
+        self._track(job)
+        return job
+
+    async def _guarded(self, coro: Coroutine):
+        async with self._async_slots:
+            return await coro
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def shared(self, key: str, factory: Callable[[], Any]) -> Any:
+        # 只在事件循环线程中调用, 因此无需加锁
+        resource = self._resources.get(key)
+        if resource is None:
+            resource = factory()
+            self._resources[key] = resource
+        return resource
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                _, _, job, fn, args, kwargs = heapq.heappop(self._heap)
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _deliver(self):
+        while True:
+            try:
+                job = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self.jobs.pop(job.id, None)
+            if job.on_done is not None:
+                name = f"callback:{job.name}"
+                timer = self.watchdog.measure(name) if self.watchdog else nullcontext()
+                try:
+                    with timer:
+                        job.on_done(job.future)
+                except Exception:
+                    pass
+        self._poll_job = self.root.after(POLL_MS, self._deliver)
+
+    async def _aclose(self):
+        # 共享资源可能是异步的 (HTTP 客户端) 或同步的 (SQLite 缓存), 两种都要关闭
+        for resource in self._resources.values():
+            try:
+                if (aclose := getattr(resource, "aclose", None)) is not None:
+                    await aclose()
+                elif (close := getattr(resource, "close", None)) is not None:
+                    close()
+            except Exception:
+                pass
+        self._resources.clear()
+
+    def close(self, timeout: float = 2.0):
+        if self._closed:
+            return
+        self.root.after_cancel(self._poll_job)
+        for job in list(self.jobs.values()):
+            job.cancel()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        if self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._aclose(), self.loop).result(timeout)
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._loop_thread.join(timeout)
@@ -1,12 +1,23 @@
+import queue
 import tkinter as tk
+from contextlib import nullcontext
 from tkinter import ttk
 
 from quv.box.common.style import FONT_MAIN
 
+FLUSH_MS = 50
+MAX_LINES = 5000
+
+_CLEAR = object()
+
 
 class Logger(ttk.Frame):
-    def __init__(self, parent, **kwargs):
+    # log/clear 可在任意线程调用: 只入队, 由 Tk 定时批量写入控件
+    def __init__(self, parent, max_lines: int = MAX_LINES, watchdog=None, **kwargs):
         super().__init__(parent, **kwargs)
+        self.max_lines = max_lines
+        self.watchdog = watchdog
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
 
         self.text = tk.Text(self, wrap=tk.WORD, font=FONT_MAIN)
         self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.text.yview)
@@ -18,13 +29,53 @@ class Logger(ttk.Frame):
         self.scrollbar.grid(row=0, column=1, sticky="ns", padx=(0, 8), pady=8)
         self.text.config(state=tk.DISABLED, padx=8, pady=8)
 
+        self._drain_job = self.after(FLUSH_MS, self._drain)
+
     def log(self, msg):
-        self.text.config(state=tk.NORMAL)
-        self.text.insert(tk.END, msg + "\n")
-        self.text.see(tk.END)
-        self.text.config(state=tk.DISABLED)
+        self._queue.put(msg)
 
     def clear(self):
-        self.text.config(state=tk.NORMAL)
-        self.text.delete("1.0", tk.END)
-        self.text.config(state=tk.DISABLED)
+        self._queue.put(_CLEAR)
+
+    def _drain(self):
+        cleared = False
+        lines: list[str] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _CLEAR:
+                # 清空之前排队的内容不必再写入
+                cleared = True
+                lines.clear()
+            else:
+                lines.append(f"{item}\n")
+
+        if cleared or lines:
+            timer = self.watchdog.measure("logger_flush") if self.watchdog else nullcontext()
+            with timer:
+                self.text.config(state=tk.NORMAL)
+                if cleared:
+                    self.text.delete("1.0", tk.END)
+                if lines:
+                    self.text.insert(tk.END, "".join(lines))
+                    self._trim()
+                    self.text.see(tk.END)
+                self.text.config(state=tk.DISABLED)
+        self._drain_job = self.after(FLUSH_MS, self._drain)
+
+    def _trim(self):
+        # 超过行数上限时丢弃最旧的行
+        count = int(self.text.index("end-1c").split(".")[0])
+        excess = count - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+
+    def export(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.text.get("1.0", "end-1c"))
+
+    def destroy(self):
+        self.after_cancel(self._drain_job)
+        super().destroy()
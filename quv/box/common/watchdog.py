@@ -0,0 +1,153 @@
+import bisect
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+HEARTBEAT_MS = 100
+STALL_MS = 250
+SAMPLE_INTERVAL = 0.05
+MAX_STALLS = 100
+# 毫秒桶上界, 最后一个桶收集其余所有
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, p: float) -> float:
+        # 返回所在桶的上界, 落在最后一个桶时返回最大值
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return 0.0
+
+    def format(self, name: str) -> str:
+        count = self.count
+        avg = self.total / count if count else 0.0
+        lines = [
+            f"{name}: n={count} avg={avg:.1f}ms p50<={self.percentile(0.5):.0f}ms "
+            f"p95<={self.percentile(0.95):.0f}ms max={self.max:.1f}ms"
+        ]
+        bounds = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        lines += [f"  {b:>9} {n}" for b, n in zip(bounds, self.counts) if n]
+        return "\n".join(lines)
+
+
+class Watchdog:
+    # 默认关闭; 开启后 Tk 心跳测量事件循环延迟, 侧线程在卡顿时采样主线程调用栈
+    def __init__(
+        self,
+        root,
+        enabled: bool = False,
+        stall_ms: int = STALL_MS,
+        heartbeat_ms: int = HEARTBEAT_MS,
+    ):
+        self.root = root
+        self.enabled = enabled
+        self.stall_ms = stall_ms
+        self.heartbeat_ms = heartbeat_ms
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.stalls: deque[dict] = deque(maxlen=MAX_STALLS)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._main_ident = threading.main_thread().ident
+        self._last_beat = time.perf_counter()
+        self._sampled = False
+        self._beat_job = None
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._last_beat = time.perf_counter()
+        self._beat_job = self.root.after(self.heartbeat_ms, self._heartbeat)
+        self._thread = threading.Thread(target=self._sample, name="quv-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._beat_job is not None:
+            self.root.after_cancel(self._beat_job)
+            self._beat_job = None
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = LatencyHistogram()
+            hist.record(ms)
+
+    def measure(self, name: str):
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def _heartbeat(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._last_beat) * 1000 - self.heartbeat_ms)
+        self.record("event_loop_lag", lag)
+        with self._lock:
+            if self._sampled and self.stalls:
+                # 卡顿结束, 补上完整时长
+                self.stalls[-1]["lag_ms"] = lag
+            self._sampled = False
+            self._last_beat = now
+        self._beat_job = self.root.after(self.heartbeat_ms, self._heartbeat)
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            with self._lock:
+                overdue = (time.perf_counter() - self._last_beat) * 1000 - self.heartbeat_ms
+                if overdue < self.stall_ms or self._sampled:
+                    continue
+                self._sampled = True
+            frame = sys._current_frames().get(self._main_ident)
+            stack = traceback.format_stack(frame) if frame is not None else []
+            with self._lock:
+                self.stalls.append(
+                    {"at": time.strftime("%H:%M:%S"), "lag_ms": overdue, "stack": stack}
+                )
+
+    def report(self) -> str:
+        with self._lock:
+            hists = sorted(self.histograms.items())
+            stalls = list(self.stalls)
+        parts = ["----- LATENCY -----"]
+        parts += [hist.format(name) for name, hist in hists] or ["(no samples)"]
+        parts.append(f"\n----- STALLS (>{self.stall_ms}ms) -----")
+        if not stalls:
+            parts.append("(none)")
+        for stall in stalls:
+            parts.append(f"{stall['at']} lag {stall['lag_ms']:.0f}ms")
+            parts.append("".join(stall["stack"]).rstrip())
+        return "\n".join(parts) + "\n"
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report())
@@ -1,22 +1,33 @@
+import argparse
+import importlib
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, ttk
 
+from quv.box.common.executor import TaskExecutor
 from quv.box.common.logger import Logger
 from quv.box.common.style import init_styles
-from quv.box.tabs.hasher.hasher import register as hasher_register
-from quv.box.tabs.hello.hello import register as hello_register
-from quv.box.tabs.mdp.mdp import register as mdp_register
-from quv.box.tabs.random.random import register as random_register
+from quv.box.common.watchdog import STALL_MS, Watchdog
 
 TITLE = "quv Box"
 WIDTH = 800
 HEIGHT = 600
 
+# (模块, 标签): 模块在 tab 第一次被选中时才导入, 避免启动时加载 httpx/blake3 等依赖
+TABS = [
+    ("quv.box.tabs.hello.hello", "hello"),
+    ("quv.box.tabs.random.random", "random"),
+    ("quv.box.tabs.hasher.hasher", "blake3"),
+    ("quv.box.tabs.mdp.mdp", "mdpr"),
+]
+
 
 class QBox(tk.Tk):
-    def __init__(self):
+    def __init__(self, watchdog: bool = False, stall_ms: int = STALL_MS, report: str | None = None):
         super().__init__()
         init_styles(self)
+        self.watchdog = Watchdog(self, watchdog, stall_ms)
+        self.report_path = report
+        self._pending_tabs: dict[str, str] = {}
 
         self.title(TITLE)
         self.resizable(False, False)
@@ -27,23 +38,64 @@ class QBox(tk.Tk):
         y = (screen_height - HEIGHT) // 2
         self.geometry(f"{WIDTH}x{HEIGHT}+{x}+{y}")
 
-        self.logger = Logger(self)
+        self.logger = Logger(self, watchdog=self.watchdog)
+        self.executor = TaskExecutor(self, watchdog=self.watchdog)
 
         self._create_menu()
         self._create_widgets()
         self._register_tabs()
+        self.watchdog.start()
 
     def _create_menu(self):
         menubar = tk.Menu(self)
 
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="Clear Log", command=self.logger.clear)
+        file_menu.add_command(label="Export Log...", command=self._export_log)
+        if self.watchdog.enabled:
+            file_menu.add_command(label="Dump Latency Report...", command=self._dump_report)
         file_menu.add_separator()
         file_menu.add_command(label="Close", command=self.destroy)
 
         menubar.add_cascade(label="File", menu=file_menu)
         self.config(menu=menubar)
 
+    def _export_log(self):
+        path = filedialog.asksaveasfilename(
+            title="Export log",
+            defaultextension=".log",
+            filetypes=[("Log files", "*.log"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            self.logger.export(path)
+        except OSError as e:
+            self.logger.log(f"Export log error: {e}")
+
+    def _dump_report(self):
+        path = filedialog.asksaveasfilename(
+            title="Dump latency report",
+            defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            self.watchdog.dump(path)
+        except OSError as e:
+            self.logger.log(f"Dump report error: {e}")
+
+    def destroy(self):
+        self.watchdog.stop()
+        if self.watchdog.enabled and self.report_path:
+            try:
+                self.watchdog.dump(self.report_path)
+            except OSError:
+                pass
+        self.executor.close()
+        super().destroy()
+
     def _create_widgets(self):
         self.tab_control = ttk.Notebook(self)
         self.tab_control.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
@@ -53,6 +105,26 @@ class QBox(tk.Tk):
         self.tab_control.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
     def _on_tab_changed(self, event):
+        sel = self.tab_control.select()
+        if sel in self._pending_tabs:
+            with self.watchdog.measure(f"tab_build:{self.tab_control.tab(sel, 'text')}"):
+                self._build_tab(sel)
+        with self.watchdog.measure("tab_switch"):
+            self._resize_to_tab()
+
+    def _build_tab(self, sel: str):
+        module_name = self._pending_tabs.pop(sel)
+        placeholder = self.tab_control.nametowidget(sel)
+        for child in placeholder.winfo_children():
+            child.destroy()
+        try:
+            module = importlib.import_module(module_name)
+            tab_frame, _ = module.register(placeholder, self.logger)
+        except Exception as e:
+            tab_frame = ttk.Label(placeholder, text=f"Failed to load {module_name}:\n{e}")
+        tab_frame.pack(fill=tk.BOTH, expand=True)
+
+    def _resize_to_tab(self):
         try:
             self.logger.clear()
         except Exception:
@@ -73,19 +145,36 @@ class QBox(tk.Tk):
             pass
 
     def _register_tabs(self):
-        tabs = [
-            hello_register(self.tab_control, self.logger),
-            random_register(self.tab_control, self.logger),
-            hasher_register(self.tab_control, self.logger),
-            mdp_register(self.tab_control, self.logger),
-        ]
-
-        for tab_frame, tab_name in tabs:
-            self.tab_control.add(tab_frame, text=tab_name)
+        # 先放占位 frame, 真正的 tab 在第一次选中时构建
+        for module_name, tab_name in TABS:
+            placeholder = ttk.Frame(self.tab_control)
+            ttk.Label(placeholder, text="Loading...").pack(padx=10, pady=10)
+            self.tab_control.add(placeholder, text=tab_name)
+            self._pending_tabs[str(placeholder)] = module_name
+
+        sel = self.tab_control.select()
+        if sel in self._pending_tabs:
+            self._build_tab(sel)
+
+
+def get_args_parser():
+    parser = argparse.ArgumentParser(description="quv box")
+    parser.add_argument(
+        "--watchdog", action="store_true", help="measure UI latency and record main-thread stalls"
+    )
+    parser.add_argument(
+        "--stall-ms",
+        type=int,
+        default=STALL_MS,
+        help=f"event-loop lag reported as a stall (default: {STALL_MS})",
+    )
+    parser.add_argument("--report", help="write the latency report to this file on exit")
+    return parser
 
 
 def cli():
-    app = QBox()
+    args = get_args_parser().parse_args()
+    app = QBox(args.watchdog, args.stall_ms, args.report)
     app.mainloop()
 
 
@@ -1,30 +1,30 @@
-import threading
+import queue
+import time
+import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog, ttk
 
-from blake3 import blake3
+from quv.hash.cache import HashCache
+from quv.hash.main import ALGORITHMS, HashCancelled, digest_calc, format_rate
 
-
-def hash_calc(data: str) -> str:
-    try:
-        p = Path(data)
-        if p.is_file():
-            data_bytes = p.read_bytes()
-        else:
-            data_bytes = str(data).encode("utf-8")
-    except Exception:
-        data_bytes = str(data).encode("utf-8")
-
-    hasher = blake3()
-    hasher.update(data_bytes)
-    return hasher.hexdigest()
+PROGRESS_INTERVAL = 0.2
+POLL_MS = 200
 
 
 class HashTab(ttk.Frame):
     def __init__(self, parent, logger, **kwargs):
         super().__init__(parent, **kwargs)
         self.logger = logger
-        self.calculating = False
+        self.executor = self.winfo_toplevel().executor
+        self._job = None
+        self.use_cache = tk.BooleanVar(value=True)
+        self.algo_vars = {algo: tk.BooleanVar(value=algo == "blake3") for algo in ALGORITHMS}
+        self._cache: HashCache | None = None
+        # 只保留最新一条进度, 由 Tk 定时轮询, 避免后台线程为每个块调用 after()
+        self._progress: queue.Queue = queue.Queue(maxsize=1)
+        self._started = 0.0
+        self._last_report = 0.0
+        self._poll_job = None
         self._create_widgets()
 
     def _create_widgets(self):
@@ -41,19 +41,110 @@ class HashTab(ttk.Frame):
         self.calc_btn = ttk.Button(btn_frame, text="Calculate", command=self._on_calculate)
         self.calc_btn.pack(side="left", padx=4)
 
+        self.cancel_btn = ttk.Button(
+            btn_frame, text="Cancel", command=self._on_cancel, state="disabled"
+        )
+        self.cancel_btn.pack(side="left", padx=4)
+
+        cache_check = ttk.Checkbutton(btn_frame, text="Use cache", variable=self.use_cache)
+        cache_check.pack(side="left", padx=4)
+
+        clear_btn = ttk.Button(btn_frame, text="Clear Cache", command=self._on_clear_cache)
+        clear_btn.pack(side="left", padx=4)
+
+        algo_frame = ttk.Frame(self)
+        algo_frame.pack(side="top", padx=4, pady=(0, 4), anchor="w")
+
+        for algo, var in self.algo_vars.items():
+            check = ttk.Checkbutton(algo_frame, text=algo, variable=var)
+            check.pack(side="left", padx=4)
+
     def _on_browse(self):
         path = filedialog.askopenfilename(title="Select file")
         if path:
             self.input_entry.delete(0, "end")
             self.input_entry.insert(0, path)
 
+    def _get_cache(self) -> HashCache:
+        if self._cache is None:
+            self._cache = HashCache()
+        return self._cache
+
+    def destroy(self):
+        # QBox 关闭时释放数据库连接
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        super().destroy()
+
+    def _on_clear_cache(self):
+        if self._job is not None:
+            return
+        try:
+            self._get_cache().clear()
+            self.logger.clear()
+            self.logger.log("Hash cache cleared.")
+        except Exception as e:
+            self.logger.log(f"Clear cache error: {e}")
+
+    def _on_cancel(self):
+        if self._job is not None:
+            self._job.cancel()
+            self.cancel_btn.config(state="disabled")
+
+    def _report_progress(self, done, total):
+        now = time.perf_counter()
+        if done < total and now - self._last_report < PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        try:
+            self._progress.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._progress.put_nowait((done, total))
+        except queue.Full:
+            pass
+
+    def _poll_progress(self):
+        if self._job is None:
+            return
+        try:
+            done, total = self._progress.get_nowait()
+        except queue.Empty:
+            done = None
+        if done is not None:
+            elapsed = time.perf_counter() - self._started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            eta = (total - done) / rate if rate > 0 else 0.0
+            pct = done * 100 / total if total else 100.0
+            try:
+                self.logger.clear()
+                self.logger.log(
+                    f"Calculating hash, please wait...\n"
+                    f"{done / 1048576:.1f}/{total / 1048576:.1f} MB ({pct:.1f}%), "
+                    f"{rate / 1048576:.2f} MB/s, ETA {eta:.1f}s"
+                )
+            except Exception:
+                pass
+        self._poll_job = self.after(POLL_MS, self._poll_progress)
+
     def _on_calculate(self):
-        if self.calculating:
+        if self._job is not None:
             return
 
         value = self.input_entry.get()
-        self.calculating = True
+        use_cache = self.use_cache.get()
+        algos = [algo for algo, var in self.algo_vars.items() if var.get()]
+        if not algos:
+            self.logger.clear()
+            self.logger.log("Please select at least one algorithm.")
+            return
+
         self.calc_btn.config(state="disabled")
+        self.cancel_btn.config(state="normal")
+        self._started = time.perf_counter()
+        self._last_report = 0.0
 
         try:
             self.logger.clear()
@@ -61,32 +152,75 @@ class HashTab(ttk.Frame):
         except Exception:
             pass
 
-        # 在后台线程中执行哈希计算
-        thread = threading.Thread(target=self._calculate_hash, args=(value,), daemon=True)
-        thread.start()
-
-    def _calculate_hash(self, value):
+        # 在共享执行器的工作线程中执行哈希计算
+        self._job = self.executor.submit(
+            self._calculate_hash,
+            value,
+            algos,
+            use_cache,
+            name="hash",
+            on_done=self._hash_done,
+            cancellable=True,
+        )
+        self._poll_job = self.after(POLL_MS, self._poll_progress)
+
+    def _calculate_hash(self, value, algos, use_cache, cancel):
+        start = time.perf_counter()
+        cache_msg = "bypassed"
         try:
-            digest = hash_calc(value)
+            cache = self._get_cache() if use_cache else None
+            hits = cache.hits if cache else 0
+            digests = digest_calc(value, algos, cache, self._report_progress, cancel)
+            if cache:
+                # 立即落盘, 命令行 qhash 可以马上用到
+                cache.flush()
+                hit_count = cache.hits - hits
+                state = "hit" if hit_count == len(algos) else "partial" if hit_count else "miss"
+                cache_msg = f"{state} ({cache.stats()})"
             error_msg = None
+        except HashCancelled:
+            digests = None
+            error_msg = "Cancelled."
         except Exception as e:
-            digest = None
+            digests = None
             error_msg = str(e)
+        elapsed = time.perf_counter() - start
+
+        try:
+            p = Path(value)
+            size = p.stat().st_size if p.is_file() else len(value.encode("utf-8"))
+        except OSError:
+            size = len(value.encode("utf-8"))
+
+        rate = format_rate(size, elapsed)
+        return value, digests, error_msg, f"{rate}\nCache: {cache_msg}"
 
-        self.after(0, self._update_result, value, digest, error_msg)
+    def _hash_done(self, future):
+        try:
+            self._update_result(*future.result())
+        except Exception as e:
+            # 任务在开始前被取消
+            self._update_result(self.input_entry.get(), None, str(e) or "Cancelled.", "")
 
-    def _update_result(self, value, digest, error_msg):
+    def _update_result(self, value, digests, error_msg, rate):
         try:
             self.logger.clear()
             if error_msg:
                 self.logger.log(f"----- INPUT -----\n{value}\n\n----- ERROR -----\n{error_msg}")
             else:
-                self.logger.log(f"----- INPUT -----\n{value}\n\n----- HASH -----\n{digest}")
+                results = "".join(
+                    f"----- {algo.upper()} -----\n{digest}\n\n" for algo, digest in digests.items()
+                )
+                self.logger.log(f"----- INPUT -----\n{value}\n\n{results}----- SPEED -----\n{rate}")
         except Exception:
             pass
         finally:
-            self.calculating = False
+            self._job = None
             self.calc_btn.config(state="normal")
+            self.cancel_btn.config(state="disabled")
+            if self._poll_job is not None:
+                self.after_cancel(self._poll_job)
+                self._poll_job = None
 
 
 def register(parent, logger):
@@ -1,34 +1,23 @@
-import asyncio
-import os
-import threading
 import time
-from pathlib import Path
+import tkinter as tk
 from tkinter import filedialog, ttk
-from urllib.parse import unquote, urlparse
 
-import aiofiles
-import httpx
-from pymdp.pymdp import MdprMedia
-
-
-async def get_images(url: str) -> list[str]:
-    async with MdprMedia(url) as mdpr:
-        image_index = await mdpr.get_image_index()
-        return await mdpr.get_image_urls(image_index) if image_index else []
-
-
-def is_valid_url(url: str) -> bool:
-    if not url:
-        return False
-    parsed = urlparse(url.strip())
-    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+from quv.mdp.archive import ARCHIVE_FORMATS, archive_all
+from quv.mdp.cache import GalleryCache
+from quv.mdp.download import DEDUPE_LINK, DEDUPE_SKIP, download_all, make_client
+from quv.mdp.main import get_images, is_valid_url
+from quv.utils.limiter import AdaptiveLimiter
 
 
 class MdpTab(ttk.Frame):
     def __init__(self, parent, logger, **kwargs):
         super().__init__(parent, **kwargs)
         self.logger = logger
+        self.executor = self.winfo_toplevel().executor
         self._image_urls: list[str] = []
+        self.link_dupes = tk.BooleanVar(value=True)
+        self.refresh = tk.BooleanVar(value=False)
+        self.save_mode = tk.StringVar(value="folder")
         self._create_widgets()
 
     def _create_widgets(self):
@@ -47,6 +36,23 @@ class MdpTab(ttk.Frame):
         )
         self.download_btn.pack(side="left", padx=4)
 
+        link_check = ttk.Checkbutton(
+            btn_frame, text="Hard-link duplicates", variable=self.link_dupes
+        )
+        link_check.pack(side="left", padx=4)
+
+        refresh_check = ttk.Checkbutton(btn_frame, text="Refresh", variable=self.refresh)
+        refresh_check.pack(side="left", padx=4)
+
+        mode_box = ttk.Combobox(
+            btn_frame,
+            textvariable=self.save_mode,
+            values=("folder", *ARCHIVE_FORMATS),
+            state="readonly",
+            width=7,
+        )
+        mode_box.pack(side="left", padx=4)
+
     def _safe_log(self, msg: str, clear: bool = False):
         try:
             if clear:
@@ -75,123 +81,91 @@ class MdpTab(ttk.Frame):
         self._image_urls = []
         self._safe_log("Fetching images...")
 
-        threading.Thread(target=self._fetch_images_thread, args=(url,), daemon=True).start()
+        self.executor.submit_async(
+            self._fetch_images_async(url, self.refresh.get()),
+            name="mdpr-fetch",
+            on_done=lambda f: self._fetch_done(url, f),
+        )
+
+    async def _fetch_images_async(self, url: str, refresh: bool) -> tuple[list[str], float, str]:
+        start = time.perf_counter()
+        cache = self.executor.shared("gallery_cache", GalleryCache)
+        hits = cache.hits
+        image_urls = await get_images(url, cache, refresh)
+        state = "refresh" if refresh else "hit" if cache.hits > hits else "miss"
+        return image_urls, time.perf_counter() - start, state
 
-    def _fetch_images_thread(self, url: str):
+    def _fetch_done(self, url: str, future):
         try:
-            start = time.perf_counter()
-            image_urls = asyncio.run(get_images(url))
-            elapsed = time.perf_counter() - start
+            image_urls, elapsed, state = future.result()
             data = "\n".join(image_urls) if image_urls else "No images found."
-            data = f"{data}\n\nElapsed: {elapsed:.3f}s"
+            data = f"{data}\n\nElapsed: {elapsed:.3f}s (cache {state})"
             self._image_urls = image_urls or []
         except Exception as e:
-            elapsed = time.perf_counter() - start if "start" in locals() else 0.0
-            data = f"Error: {e}\n\nElapsed: {elapsed:.3f}s"
+            data = f"Error: {e}"
             self._image_urls = []
 
-        def finish():
-            self._safe_log(f"----- URL -----\n{url}\n\n----- IMAGES -----\n{data}", clear=True)
-            self._set_buttons(True, bool(self._image_urls))
-
-        self.after(0, finish)
+        self._safe_log(f"----- URL -----\n{url}\n\n----- IMAGES -----\n{data}", clear=True)
+        self._set_buttons(True, bool(self._image_urls))
 
     def _on_download(self):
         if not self._image_urls:
             self._safe_log("No images to download. Please click Get first.", clear=True)
             return
 
-        folder = filedialog.askdirectory(title="Choose download folder")
-        if not folder:
+        mode = self.save_mode.get()
+        if mode in ARCHIVE_FORMATS:
+            target = filedialog.asksaveasfilename(
+                title="Save archive as",
+                defaultextension=f".{mode}",
+                filetypes=[(f"{mode} archive", f"*.{mode}")],
+            )
+        else:
+            target = filedialog.askdirectory(title="Choose download folder")
+        if not target:
             return
 
+        dedupe = DEDUPE_LINK if self.link_dupes.get() else DEDUPE_SKIP
         self._set_buttons(False, False)
-        self._safe_log(f"Starting download: {len(self._image_urls)} images -> {folder}", clear=True)
+        self._safe_log(f"Starting download: {len(self._image_urls)} images -> {target}", clear=True)
 
-        threading.Thread(target=self._download_images_thread, args=(folder,), daemon=True).start()
+        self.executor.submit_async(
+            self._download_images_async(target, dedupe, mode),
+            name="mdpr-download",
+            on_done=self._download_done,
+        )
 
-    def _download_images_thread(self, folder: str):
+    def _download_done(self, future):
         try:
-            data = asyncio.run(self._download_images_async(folder))
+            data = future.result()
         except Exception as e:
-            elapsed = 0.0
-            data = f"Error: {e}\n\nElapsed: {elapsed:.3f}s"
+            data = f"Error: {e}"
 
-        def finish():
-            self._safe_log(f"----- DOWNLOAD -----\n{data}", clear=True)
-            self._set_buttons(True, bool(self._image_urls))
+        self._safe_log(f"----- DOWNLOAD -----\n{data}", clear=True)
+        self._set_buttons(True, bool(self._image_urls))
 
-        self.after(0, finish)
-
-    async def _download_images_async(self, folder: str) -> str:
+    async def _download_images_async(self, target: str, dedupe: str, mode: str) -> str:
         start = time.perf_counter()
-        total = len(self._image_urls)
-        successes = 0
-        failures = 0
-        messages: list[str] = []
-
-        semaphore = asyncio.Semaphore(4)
-
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-
-            async def download_one(idx: int, img_url: str):
-                nonlocal successes, failures
-                async with semaphore:
-                    try:
-                        async with client.stream("GET", img_url) as resp:
-                            resp.raise_for_status()
-
-                            parsed = urlparse(img_url)
-                            name = os.path.basename(unquote(parsed.path)) or f"image_{idx}"
-                            dst = Path(folder) / name
-
-                            if dst.exists():
-                                stem = dst.stem
-                                suffix = dst.suffix
-                                k = 1
-                                while True:
-                                    new_name = f"{stem}_{k}{suffix}"
-                                    new_dst = dst.with_name(new_name)
-                                    if not new_dst.exists():
-                                        dst = new_dst
-                                        break
-                                    k += 1
-
-                            total_bytes = 0
-                            chunk_size = 65536
-                            async with aiofiles.open(dst, "wb") as f:
-                                async for chunk in resp.aiter_bytes(chunk_size=chunk_size):
-                                    if chunk:
-                                        await f.write(chunk)
-                                        total_bytes += len(chunk)
-
-                        msg = f"[{idx}/{total}] Saved: {dst} ({total_bytes} bytes)"
-                        try:
-                            self.after(0, lambda m=msg: self.logger.log(m))
-                        except Exception:
-                            pass
-                        successes += 1
-                        return msg
-                    except Exception as e:
-                        msg = f"[{idx}/{total}] Failed: {img_url} -> {e}"
-                        try:
-                            self.after(0, lambda m=msg: self.logger.log(m))
-                        except Exception:
-                            pass
-                        failures += 1
-                        return msg
-
-            tasks = [
-                asyncio.create_task(download_one(idx, url))
-                for idx, url in enumerate(self._image_urls, start=1)
-            ]
-            for coro in asyncio.as_completed(tasks):
-                msg = await coro
-                messages.append(msg)
+
+        # 客户端和限流器在多次 Get/Download 之间复用, 保持长连接和已学习到的并发度
+        client = self.executor.shared("http", make_client)
+        limiter = self.executor.shared("limiter", AdaptiveLimiter)
+
+        # Logger.log 是线程安全的, 直接从事件循环线程写入
+        log = self.logger.log
+        if mode in ARCHIVE_FORMATS:
+            result = await archive_all(client, self._image_urls, target, limiter, mode, log)
+        else:
+            result = await download_all(client, self._image_urls, target, limiter, dedupe, log)
 
         elapsed = time.perf_counter() - start
-        summary = f"Downloaded: {successes}, Failed: {failures}, Elapsed: {elapsed:.3f}s"
-        return "\n".join(messages + ["", summary])
+        summary = (
+            f"Downloaded: {result['saved'] + result['duplicates']}, "
+            f"Duplicates: {result['duplicates']}, Unchanged: {result['unchanged']}, "
+            f"Failed: {result['failed']}, Elapsed: {elapsed:.3f}s"
+        )
+        summary += f"\nConcurrency: {limiter.stats()}"
+        return "\n".join(result["messages"] + ["", summary])
 
 
 def register(parent, logger):
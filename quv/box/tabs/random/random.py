@@ -16,7 +16,15 @@ class RandomTab(ttk.Frame):
 
     def generate(self):
         self.logger.clear()
-        random_values = generate_random()
+        executor = self.winfo_toplevel().executor
+        executor.submit(generate_random, name="random", on_done=self._generated)
+
+    def _generated(self, future):
+        try:
+            random_values = future.result()
+        except Exception as e:
+            self.logger.log(f"Error: {e}")
+            return
         output = f"Password:\n{random_values['password']}\n\nSecure:\n{random_values['secure']}\n\nUUID v4\n{random_values['uuidv4']}"
         self.logger.log(output)
 
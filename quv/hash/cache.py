@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from quv.utils.cache import cache_dir
+
+MAX_ENTRIES = 200_000
+COMMIT_EVERY = 256
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    dev INTEGER NOT NULL,
+    ino INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    algo TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    atime REAL NOT NULL,
+    PRIMARY KEY (dev, ino, size, mtime_ns, algo)
+);
+CREATE INDEX IF NOT EXISTS hashes_atime ON hashes (atime);
+"""
+
+
+def default_cache_path() -> Path:
+    return cache_dir("hash") / "hash.db"
+
+
+def file_key(path: str | Path, st: os.stat_result | None = None) -> tuple[int, int, int, int]:
+    # Windows 下 scandir 返回的 stat 没有 inode, 需要重新 stat
+    if st is None or not st.st_ino:
+        st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class HashCache:
+    # 写入和 atime 更新先缓存在内存, 每 COMMIT_EVERY 次或 flush/close 时用一个短事务写入,
+    # 调用之间不持有写锁, GUI 与命令行可以同时使用同一个数据库
+    def __init__(self, path: str | Path | None = None, max_entries: int = MAX_ENTRIES):
+        self.path = Path(path) if path else default_cache_path()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts: dict[tuple, tuple[str, float]] = {}
+        self._touched: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, timeout=BUSY_TIMEOUT, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def get(
+        self, path: str | Path, st: os.stat_result | None = None, algo: str = "blake3"
+    ) -> str | None:
+        key = (*file_key(path, st), algo)
+        with self._lock:
+            pending = self._puts.get(key)
+            if pending is not None:
+                self.hits += 1
+                return pending[0]
+            row = self._conn.execute(
+                "SELECT digest FROM hashes"
+                " WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND algo = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[key] = time.time()
+            self._touch()
+            return row[0]
+
+    def put(
+        self,
+        path: str | Path,
+        digest: str,
+        st: os.stat_result | None = None,
+        algo: str = "blake3",
+    ) -> None:
+        key = (*file_key(path, st), algo)
+        with self._lock:
+            self._puts[key] = (digest, time.time())
+            self._touched.pop(key, None)
+            self._touch()
+
+    def _touch(self):
+        if len(self._puts) + len(self._touched) >= COMMIT_EVERY:
+            self._flush()
+
+    def _flush(self):
+        if not self._puts and not self._touched:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes"
+                " (dev, ino, size, mtime_ns, algo, digest, atime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(*key, digest, atime) for key, (digest, atime) in self._puts.items()],
+            )
+            self._conn.executemany(
+                "UPDATE hashes SET atime = ?"
+                " WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND algo = ?",
+                [(atime, *key) for key, atime in self._touched.items()],
+            )
+            # 按最近访问时间淘汰, 多删一成避免每次提交都触发淘汰
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM hashes").fetchone()
+            if count > self.max_entries:
+                excess = count - self.max_entries + self.max_entries // 10
+                self._conn.execute(
+                    "DELETE FROM hashes WHERE rowid IN"
+                    " (SELECT rowid FROM hashes ORDER BY atime LIMIT ?)",
+                    (excess,),
+                )
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._puts.clear()
+        self._touched.clear()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._puts.clear()
+            self._touched.clear()
+            self._conn.execute("DELETE FROM hashes")
+        self.hits = 0
+        self.misses = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,526 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from blake3 import blake3
+
+from quv.hash import merkle
+from quv.hash.cache import HashCache
+
+CHUNK_SIZE = 1024 * 1024
+MT_CHUNK_SIZE = 16 * 1024 * 1024
+MT_THRESHOLD = 64 * 1024 * 1024
+
+ALGORITHMS = ("blake3", "sha256", "sha1", "md5")
+DEFAULT_ALGOS = ("blake3",)
+
+ProgressFn = Callable[[int, int], None]
+
+BATCH_BYTES = 8 * 1024 * 1024
+BATCH_FILES = 256
+
+
+def new_hasher(algo: str, size: int = 0, mt_threshold: int = MT_THRESHOLD):
+    if algo == "blake3":
+        return blake3(max_threads=blake3.AUTO) if size >= mt_threshold else blake3()
+    return hashlib.new(algo)
+
+
+class HashCancelled(Exception):
+    pass
+
+
+def check_cancel(cancel: threading.Event | None, path: str | Path) -> None:
+    if cancel is not None and cancel.is_set():
+        raise HashCancelled(f"cancelled: {path}")
+
+
+def hash_file_multi(
+    path: str | Path,
+    algos: Sequence[str] = DEFAULT_ALGOS,
+    mt_threshold: int = MT_THRESHOLD,
+    progress: ProgressFn | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, str]:
+    p = Path(path)
+    size = p.stat().st_size
+    hashers = {algo: new_hasher(algo, size, mt_threshold) for algo in algos}
+
+    # 大文件走多线程路径, 缓冲区固定大小, 内存占用与文件大小无关
+    chunk_size = MT_CHUNK_SIZE if size >= mt_threshold else CHUNK_SIZE
+    fast = [h for algo, h in hashers.items() if algo == "blake3"]
+    slow = [h for algo, h in hashers.items() if algo != "blake3"]
+    done = 0
+
+    # 每块检查一次取消标志并回报进度, 取消最多延迟一个块
+    with p.open("rb", buffering=0) as f:
+        if not slow or size <= chunk_size:
+            buf = bytearray(chunk_size)
+            view = memoryview(buf)
+            while True:
+                check_cancel(cancel, p)
+                n = f.readinto(buf)
+                if not n:
+                    break
+                for h in hashers.values():
+                    h.update(view[:n])
+                done += n
+                if progress:
+                    progress(done, size)
+        else:
+            # 单次读取: hashlib 更新在各自的单线程执行器中进行 (释放 GIL, 保证顺序),
+            # 双缓冲让读取下一块与哈希当前块重叠
+            pools = [ThreadPoolExecutor(max_workers=1) for _ in slow]
+            bufs = [bytearray(chunk_size), bytearray(chunk_size)]
+            pending: list[list] = [[], []]
+            i = 0
+            try:
+                while True:
+                    wait(pending[i])
+                    check_cancel(cancel, p)
+                    n = f.readinto(bufs[i])
+                    if not n:
+                        break
+                    view = memoryview(bufs[i])[:n]
+                    pending[i] = [pool.submit(h.update, view) for pool, h in zip(pools, slow)]
+                    for h in fast:
+                        h.update(view)
+                    i ^= 1
+                    done += n
+                    if progress:
+                        progress(done, size)
+                for fut in pending[0] + pending[1]:
+                    fut.result()
+            finally:
+                for pool in pools:
+                    pool.shutdown(cancel_futures=True)
+
+    return {algo: h.hexdigest() for algo, h in hashers.items()}
+
+
+def hash_file(path: str | Path, mt_threshold: int = MT_THRESHOLD) -> str:
+    return hash_file_multi(path, ("blake3",), mt_threshold)["blake3"]
+
+
+def digest_calc(
+    data: str,
+    algos: Sequence[str] = DEFAULT_ALGOS,
+    cache: HashCache | None = None,
+    progress: ProgressFn | None = None,
+    cancel: threading.Event | None = None,
+) -> dict[str, str]:
+    try:
+        p = Path(data)
+        if p.is_file():
+            if cache is None:
+                return hash_file_multi(p, algos, progress=progress, cancel=cancel)
+            st = p.stat()
+            digests = {algo: cache.get(p, st, algo) for algo in algos}
+            # 只计算缓存未命中的算法, 仍然只读一遍文件
+            todo = [algo for algo, digest in digests.items() if digest is None]
+            if todo:
+                computed = hash_file_multi(p, todo, progress=progress, cancel=cancel)
+                for algo, digest in computed.items():
+                    cache.put(p, digest, st, algo)
+                cache.flush()
+                digests.update(computed)
+            return digests
+    except OSError:
+        pass
+
+    raw = str(data).encode("utf-8")
+    digests = {}
+    for algo in algos:
+        h = new_hasher(algo)
+        h.update(raw)
+        digests[algo] = h.hexdigest()
+    return digests
+
+
+def hash_calc(data: str, cache: HashCache | None = None) -> str:
+    return digest_calc(data, ("blake3",), cache)["blake3"]
+
+
+def format_rate(size: int, elapsed: float) -> str:
+    mb = size / (1024 * 1024)
+    rate = mb / elapsed if elapsed > 0 else 0.0
+    return f"{mb:.2f} MB in {elapsed:.3f}s ({rate:.2f} MB/s)"
+
+
+def scan_files(root: str) -> Iterator[tuple[str, os.stat_result]]:
+    if not os.path.isdir(root):
+        yield root, os.stat(root)
+        return
+
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as err:
+            print(f"qhash: {current}: {err}", file=sys.stderr)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path, entry.stat()
+            except OSError as err:
+                print(f"qhash: {entry.path}: {err}", file=sys.stderr)
+        stack.extend(reversed(subdirs))
+
+
+def iter_batches(
+    files: Iterable[tuple[str, int]],
+    batch_bytes: int = BATCH_BYTES,
+    batch_files: int = BATCH_FILES,
+) -> Iterator[list[tuple[str, int]]]:
+    batch: list[tuple[str, int]] = []
+    batch_size = 0
+    for path, size in files:
+        # 大文件单独成批, 小文件攒够数量或字节数再提交, 降低每个任务的调度开销
+        if size >= batch_bytes:
+            yield [(path, size)]
+            continue
+        batch.append((path, size))
+        batch_size += size
+        if batch_size >= batch_bytes or len(batch) >= batch_files:
+            yield batch
+            batch = []
+            batch_size = 0
+    if batch:
+        yield batch
+
+
+HashResult = tuple[str, int, str | None, str | None]
+
+
+def hash_batch(batch: list[tuple[str, int]]) -> list[HashResult]:
+    results = []
+    for path, size in batch:
+        try:
+            results.append((path, size, hash_file(path), None))
+        except OSError as err:
+            results.append((path, size, None, str(err)))
+    return results
+
+
+def format_line(digest: str, path: str) -> str:
+    # 与 b3sum 一致: 路径中含反斜杠或换行时转义并在行首加反斜杠
+    if "\\" in path or "\n" in path:
+        escaped = path.replace("\\", "\\\\").replace("\n", "\\n")
+        return f"\\{digest}  {escaped}"
+    return f"{digest}  {path}"
+
+
+def parse_line(line: str) -> tuple[str, str] | None:
+    line = line.rstrip("\r\n")
+    escaped = line.startswith("\\")
+    if escaped:
+        line = line[1:]
+    digest, sep, path = line.partition("  ")
+    if not sep or len(digest) != 64 or not path:
+        return None
+    if escaped:
+        path = re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), path)
+    return digest.lower(), path
+
+
+def load_manifest(manifest: str) -> tuple[list[tuple[str, str, int]], list[str], int]:
+    entries: list[tuple[str, str, int]] = []
+    missing: list[str] = []
+    invalid = 0
+    with open(manifest, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            parsed = parse_line(line)
+            if parsed is None:
+                invalid += 1
+                continue
+            digest, path = parsed
+            try:
+                entries.append((path, digest, os.stat(path).st_size))
+            except OSError:
+                missing.append(path)
+
+    # 大文件优先 (LPT), 避免最后一个大文件拖住其他空闲的 worker
+    entries.sort(key=lambda e: e[2], reverse=True)
+    return entries, missing, invalid
+
+
+def verify_entries(
+    entries: list[tuple[str, str, int]],
+    workers: int,
+    use_threads: bool = False,
+    fail_fast: bool = False,
+) -> Iterator[tuple[str, int, bool, str | None]]:
+    expected = {path: digest for path, digest, _size in entries}
+    batches = iter_batches((path, size) for path, _digest, size in entries)
+
+    pool_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        pending = set()
+        stop = False
+
+        def drain(done):
+            nonlocal stop
+            for fut in done:
+                for path, size, digest, error in fut.result():
+                    ok = error is None and digest == expected[path]
+                    stop = stop or (fail_fast and not ok)
+                    yield path, size, ok, error
+
+        for batch in batches:
+            pending.add(pool.submit(hash_batch, batch))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from drain(done)
+            if stop:
+                break
+        while pending and not stop:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            yield from drain(done)
+        for fut in pending:
+            fut.cancel()
+
+
+def hash_tree(
+    roots: list[str],
+    workers: int,
+    use_threads: bool = False,
+    cache: HashCache | None = None,
+) -> Iterator[HashResult]:
+    files = (item for root in roots for item in scan_files(root))
+    stats: dict[str, os.stat_result] = {}
+
+    def finish(results: list[HashResult]) -> list[HashResult]:
+        if cache:
+            for path, _size, digest, _error in results:
+                st = stats.pop(path, None)
+                if digest and st is not None:
+                    cache.put(path, digest, st)
+        return results
+
+    pool_cls = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        pending = set()
+
+        # 限制在途批次数量, 扫描与哈希同时进行且内存有界
+        def submit(batch: list[tuple[str, int]]) -> list[HashResult]:
+            nonlocal pending
+            pending.add(pool.submit(hash_batch, batch))
+            if len(pending) < workers * 2:
+                return []
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            return [result for fut in done for result in finish(fut.result())]
+
+        batch: list[tuple[str, int]] = []
+        batch_size = 0
+        for path, st in files:
+            digest = cache.get(path, st) if cache else None
+            if digest:
+                # 缓存命中立即产出, 不等未命中的文件凑满一批
+                yield path, st.st_size, digest, None
+                continue
+            if cache:
+                stats[path] = st
+            # 与 iter_batches 相同: 大文件单独成批, 小文件攒够数量或字节数再提交
+            if st.st_size >= BATCH_BYTES:
+                yield from submit([(path, st.st_size)])
+                continue
+            batch.append((path, st.st_size))
+            batch_size += st.st_size
+            if batch_size >= BATCH_BYTES or len(batch) >= BATCH_FILES:
+                yield from submit(batch)
+                batch, batch_size = [], 0
+        if batch:
+            yield from submit(batch)
+        for fut in pending:
+            yield from finish(fut.result())
+
+
+def get_args_parser():
+    parser = argparse.ArgumentParser(description="Parallel blake3 hasher (b3sum format)")
+    parser.add_argument("paths", nargs="+", help="files or directories (manifests with -c)")
+    parser.add_argument(
+        "-c", "--check", dest="check", action="store_true", help="verify files against manifests"
+    )
+    parser.add_argument(
+        "--fail-fast",
+        dest="fail_fast",
+        action="store_true",
+        help="with -c, stop at the first mismatch",
+    )
+    parser.add_argument(
+        "--merkle",
+        dest="merkle",
+        action="store_true",
+        help="chunked Merkle hash with a .b3idx sidecar index, report changed byte ranges",
+    )
+    parser.add_argument(
+        "--diff",
+        dest="diff",
+        action="store_true",
+        help="report byte ranges that differ between two files (OLD NEW)",
+    )
+    parser.add_argument("-o", dest="output", type=str, help="manifest file (default: stdout)")
+    parser.add_argument(
+        "-j", dest="workers", type=int, default=os.cpu_count() or 1, help="worker count"
+    )
+    parser.add_argument(
+        "--threads",
+        dest="use_threads",
+        action="store_true",
+        help="use a thread pool instead of a process pool",
+    )
+    parser.add_argument(
+        "--no-cache", dest="no_cache", action="store_true", help="bypass the hash cache"
+    )
+    parser.add_argument(
+        "--clear-cache", dest="clear_cache", action="store_true", help="clear the hash cache first"
+    )
+    return parser
+
+
+def cli():
+    main()
+
+
+def run_check(args) -> int:
+    start = time.perf_counter()
+    ok_count = 0
+    failed = 0
+    missing_count = 0
+    invalid_count = 0
+    total_bytes = 0
+    stopped = False
+
+    for manifest in args.paths:
+        entries, missing, invalid = load_manifest(manifest)
+        invalid_count += invalid
+        missing_count += len(missing)
+        for path in missing:
+            print(f"{path}: MISSING")
+        if missing and args.fail_fast:
+            stopped = True
+            break
+
+        for path, size, ok, error in verify_entries(
+            entries, max(1, args.workers), args.use_threads, args.fail_fast
+        ):
+            total_bytes += size
+            if ok:
+                ok_count += 1
+                print(f"{path}: OK")
+            else:
+                failed += 1
+                print(f"{path}: FAILED" + (f" ({error})" if error else ""))
+        if failed and args.fail_fast:
+            stopped = True
+            break
+
+    elapsed = time.perf_counter() - start
+    summary = (
+        f"OK: {ok_count}, FAILED: {failed}, MISSING: {missing_count}, "
+        f"{format_rate(total_bytes, elapsed)}"
+    )
+    if invalid_count:
+        summary += f", Invalid lines: {invalid_count}"
+    if stopped:
+        summary += " (stopped at first mismatch)"
+    print(summary, file=sys.stderr)
+    return 1 if failed or missing_count or invalid_count else 0
+
+
+def run_merkle(args) -> int:
+    if args.diff:
+        if len(args.paths) != 2:
+            print("Error: --diff requires exactly two files: OLD NEW", file=sys.stderr)
+            return 2
+        old_path, new_path = args.paths
+        old = merkle.merkle_hash(old_path)
+        new = merkle.merkle_hash(new_path)
+        print(f"{old['root']}  {old_path}")
+        print(f"{new['root']}  {new_path}")
+        removed = merkle.diff_ranges(new["chunks"], old["chunks"])
+        changed = merkle.diff_ranges(old["chunks"], new["chunks"])
+        print(f"Removed from OLD: {merkle.format_ranges(removed)}")
+        print(f"Changed in NEW: {merkle.format_ranges(changed)}")
+        return 0
+
+    for path in args.paths:
+        start = time.perf_counter()
+        result = merkle.merkle_hash(path)
+        elapsed = time.perf_counter() - start
+        print(format_line(result["root"], path))
+        state = "unchanged (index)" if result["cached"] else merkle.format_ranges(result["changed"])
+        print(
+            f"qhash: {path}: chunks={len(result['chunks'])}, changed: {state}, {elapsed:.3f}s",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def main():
+    args = get_args_parser().parse_args()
+
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"Error: file does not exist: {path}", file=sys.stderr)
+            sys.exit(2)
+
+    if args.check:
+        sys.exit(run_check(args))
+    if args.merkle or args.diff:
+        sys.exit(run_merkle(args))
+
+    cache = None if args.no_cache else HashCache()
+    if args.clear_cache:
+        with HashCache() as c:
+            c.clear()
+
+    out = open(args.output, "w", encoding="utf-8", newline="\n") if args.output else sys.stdout
+    start = time.perf_counter()
+    total_files = 0
+    total_bytes = 0
+    errors = 0
+    try:
+        for path, size, digest, error in hash_tree(
+            args.paths, max(1, args.workers), args.use_threads, cache
+        ):
+            if error:
+                errors += 1
+                print(f"qhash: {path}: {error}", file=sys.stderr)
+                continue
+            out.write(format_line(digest, path) + "\n")
+            total_files += 1
+            total_bytes += size
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    summary = f"Files: {total_files}, Errors: {errors}, {format_rate(total_bytes, elapsed)}"
+    if cache:
+        summary += f", Cache: {cache.stats()}"
+    print(summary, file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+from blake3 import blake3
+
+# 内容定义分块: 在 [MIN_CHUNK, MAX_CHUNK] 范围内查找锚点字节序列作为边界,
+# 插入或删除数据后边界会在下一个锚点处重新对齐, bytes.find 在 C 层扫描, 速度接近读盘
+MIN_CHUNK = 1024 * 1024
+MAX_CHUNK = 8 * 1024 * 1024
+ANCHOR = b"\x9d\xb1"
+READ_SIZE = 4 * 1024 * 1024
+
+INDEX_SUFFIX = ".b3idx"
+INDEX_VERSION = 1
+
+Chunk = tuple[int, int, str]
+
+
+def iter_chunks(path: str | Path) -> Iterator[tuple[int, bytes]]:
+    buf = bytearray()
+    offset = 0
+    eof = False
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            while not eof and len(buf) < MAX_CHUNK:
+                data = f.read(READ_SIZE)
+                if not data:
+                    eof = True
+                    break
+                buf += data
+
+            if not buf:
+                return
+
+            pos = buf.find(ANCHOR, MIN_CHUNK, MAX_CHUNK)
+            cut = pos + len(ANCHOR) if pos >= 0 else min(len(buf), MAX_CHUNK)
+            chunk = bytes(buf[:cut])
+            del buf[:cut]
+            yield offset, chunk
+            offset += cut
+
+
+def chunk_file(path: str | Path) -> list[Chunk]:
+    return [(offset, len(chunk), blake3(chunk).hexdigest()) for offset, chunk in iter_chunks(path)]
+
+
+def merkle_root(digests: list[str]) -> str:
+    if not digests:
+        return blake3(b"").hexdigest()
+
+    level = [bytes.fromhex(d) for d in digests]
+    while len(level) > 1:
+        parents = []
+        for i in range(0, len(level) - 1, 2):
+            parents.append(blake3(b"\x01" + level[i] + level[i + 1]).digest())
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0].hex()
+
+
+def index_path_for(path: str | Path) -> Path:
+    p = Path(path)
+    return p.with_name(p.name + INDEX_SUFFIX)
+
+
+def load_index(index_path: str | Path) -> dict | None:
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    index["chunks"] = [tuple(c) for c in index.get("chunks", [])]
+    return index
+
+
+def save_index(index_path: str | Path, index: dict) -> None:
+    tmp = Path(f"{index_path}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path)
+
+
+def diff_ranges(old: list[Chunk], new: list[Chunk]) -> list[tuple[int, int]]:
+    old_digests = {digest for _offset, _length, digest in old}
+    ranges: list[tuple[int, int]] = []
+    for offset, length, digest in new:
+        if digest in old_digests:
+            continue
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1] = (ranges[-1][0], offset + length)
+        else:
+            ranges.append((offset, offset + length))
+    return ranges
+
+
+def merkle_hash(
+    path: str | Path, index_path: str | Path | None = None, force: bool = False
+) -> dict:
+    index_path = index_path or index_path_for(path)
+    st = os.stat(path)
+    identity = [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns]
+
+    old = load_index(index_path)
+    if old and old.get("identity") == identity and not force:
+        return {"root": old["root"], "chunks": old["chunks"], "changed": [], "cached": True}
+
+    chunks = chunk_file(path)
+    root = merkle_root([digest for _offset, _length, digest in chunks])
+    changed = diff_ranges(old["chunks"], chunks) if old else [(0, st.st_size)]
+
+    save_index(
+        index_path,
+        {"version": INDEX_VERSION, "identity": identity, "root": root, "chunks": chunks},
+    )
+    return {"root": root, "chunks": chunks, "changed": changed, "cached": False}
+
+
+def format_ranges(ranges: list[tuple[int, int]]) -> str:
+    return ", ".join(f"{start}-{end}" for start, end in ranges) or "none"
@@ -0,0 +1,226 @@
+import asyncio
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from collections.abc import Callable
+from contextlib import nullcontext
+from pathlib import Path
+
+import httpx
+from blake3 import blake3
+
+from quv.mdp.download import CHUNK_SIZE, image_name, retry_delay
+from quv.mdp.writer import BufferedFileWriter
+from quv.utils.limiter import AdaptiveLimiter, Slot
+
+ARCHIVE_FORMATS = ("zip", "tar")
+SPOOL_LIMIT = 4 * 1024 * 1024
+
+
+class ArchiveWriter:
+    # 多个下载并发进行, 但归档只能顺序写入: 每个响应先完整接收 (小文件在内存中,
+    # 超过 SPOOL_LIMIT 的落到归档旁的临时文件), 只有写入成员时才持锁, 不完整的响应不会进入归档.
+    # 每次都写一个新的 <path>.tmp, 关闭时再替换目标, 重复运行不会追加重复成员
+    def __init__(self, path: str | Path, fmt: str = "zip"):
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"unsupported archive format: {fmt}")
+        self.path = Path(path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.fmt = fmt
+        if fmt == "zip":
+            self._archive = zipfile.ZipFile(self.tmp_path, "w", zipfile.ZIP_STORED)
+        else:
+            self._archive = tarfile.open(self.tmp_path, "w")
+        self.names: set[str] = set()
+        self.by_digest: dict[str, str] = {}
+        self.lock = asyncio.Lock()
+
+    def claim(self, name: str) -> str:
+        stem, suffix = os.path.splitext(name)
+        candidate = name
+        k = 1
+        while candidate in self.names:
+            candidate = f"{stem}_{k}{suffix}"
+            k += 1
+        self.names.add(candidate)
+        return candidate
+
+    def write_entry(self, name: str, data: bytes | Path) -> None:
+        # data 为内存中的内容或已完整接收的临时文件
+        if isinstance(data, bytes):
+            src = io.BytesIO(data)
+            size = len(data)
+        else:
+            src = data.open("rb")
+            size = data.stat().st_size
+        with src:
+            if self.fmt == "zip":
+                # 预先给出大小, 由 zipfile 判断是否需要 zip64
+                info = zipfile.ZipInfo(name, time.localtime()[:6])
+                info.file_size = size
+                info.external_attr = 0o600 << 16
+                with self._archive.open(info, "w") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE * 16)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = size
+                info.mtime = int(time.time())
+                self._archive.addfile(info, src)
+
+    def spool_path(self) -> Path:
+        fd, path = tempfile.mkstemp(
+            prefix=self.path.name + ".", suffix=".spool", dir=self.path.parent
+        )
+        os.close(fd)
+        return Path(path)
+
+    def close(self, commit: bool = True) -> None:
+        try:
+            self._archive.close()
+        except BaseException:
+            self.tmp_path.unlink(missing_ok=True)
+            raise
+        if commit:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+
+
+async def receive(
+    resp: httpx.Response, archive: ArchiveWriter, hasher: blake3
+) -> tuple[bytes | Path, int]:
+    # 完整接收响应正文: 不超过 SPOOL_LIMIT 时返回内存中的内容, 否则返回临时文件
+    chunks: list[bytes] = []
+    received = 0
+    spool: Path | None = None
+    writer: BufferedFileWriter | None = None
+    try:
+        async for chunk in resp.aiter_bytes(chunk_size=CHUNK_SIZE):
+            hasher.update(chunk)
+            received += len(chunk)
+            if writer is not None:
+                await writer.write(chunk)
+                continue
+            chunks.append(chunk)
+            if received > SPOOL_LIMIT:
+                spool = await asyncio.to_thread(archive.spool_path)
+                writer = BufferedFileWriter(spool)
+                for buffered in chunks:
+                    await writer.write(buffered)
+                chunks.clear()
+        if writer is not None:
+            await writer.close()
+            writer = None
+    except BaseException:
+        if writer is not None:
+            await writer.close()
+        if spool is not None:
+            spool.unlink(missing_ok=True)
+        raise
+    if spool is None:
+        return b"".join(chunks), received
+    return spool, received
+
+
+async def archive_image(
+    client: httpx.AsyncClient,
+    url: str,
+    name: str,
+    archive: ArchiveWriter,
+    limiter: AdaptiveLimiter | None = None,
+) -> tuple[str, str, int]:
+    attempt = 0
+    while True:
+        try:
+            async with (
+                limiter.slot(url) if limiter else nullcontext(Slot()) as slot,
+                client.stream("GET", url) as resp,
+            ):
+                slot.mark_response(resp.status_code)
+                resp.raise_for_status()
+                hasher = blake3()
+                data, received = await receive(resp, archive, hasher)
+                slot.nbytes = received
+            break
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+        attempt += 1
+        await asyncio.sleep(delay)
+
+    # 已经释放连接和限流槽, 只在写入成员时持有归档锁
+    try:
+        digest = hasher.hexdigest()
+        existing = archive.by_digest.get(digest)
+        if existing is not None:
+            return existing, "Duplicate", received
+        # 等锁之前先登记摘要, 并发完成的相同内容不会重复写入
+        archive.by_digest[digest] = name
+        async with archive.lock:
+            await asyncio.to_thread(archive.write_entry, name, data)
+        return name, "Saved", received
+    finally:
+        if isinstance(data, Path):
+            data.unlink(missing_ok=True)
+
+
+async def archive_all(
+    client: httpx.AsyncClient,
+    image_urls: list[str],
+    path: str | Path,
+    limiter: AdaptiveLimiter,
+    fmt: str = "zip",
+    log: Callable[[str], None] | None = None,
+) -> dict:
+    total = len(image_urls)
+    result = {
+        "messages": [],
+        "saved": 0,
+        "duplicates": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "bytes": 0,
+    }
+    archive = ArchiveWriter(path, fmt)
+
+    async def archive_one(idx: int, img_url: str) -> str:
+        name = archive.claim(image_name(img_url, idx))
+        try:
+            entry, state, nbytes = await archive_image(client, img_url, name, archive, limiter)
+            result["bytes"] += nbytes
+            if state == "Saved":
+                result["saved"] += 1
+                return f"[{idx}/{total}] Saved: {archive.path}:{entry} ({nbytes} bytes)"
+            result["duplicates"] += 1
+            archive.names.discard(name)
+            return f"[{idx}/{total}] Duplicate skipped: {img_url} (same as {entry})"
+        except Exception as e:
+            result["failed"] += 1
+            archive.names.discard(name)
+            return f"[{idx}/{total}] Failed: {img_url} -> {e}"
+
+    tasks = [
+        asyncio.create_task(archive_one(idx, url)) for idx, url in enumerate(image_urls, start=1)
+    ]
+    commit = False
+    try:
+        for coro in asyncio.as_completed(tasks):
+            msg = await coro
+            result["messages"].append(msg)
+            if log:
+                log(msg)
+        # 有失败时不覆盖之前完整的归档
+        commit = not result["failed"] or not archive.path.exists()
+        if not commit:
+            msg = f"Kept previous archive {archive.path}: {result['failed']} images failed"
+            result["messages"].append(msg)
+            if log:
+                log(msg)
+    finally:
+        await asyncio.to_thread(archive.close, commit)
+    return result
@@ -0,0 +1,85 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from quv.utils.cache import cache_dir
+
+DEFAULT_TTL = 24 * 3600
+MAX_ENTRIES = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS galleries (
+    url TEXT PRIMARY KEY,
+    images TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS galleries_atime ON galleries (atime);
+"""
+
+
+def default_cache_path() -> Path:
+    return cache_dir("mdp") / "galleries.db"
+
+
+class GalleryCache:
+    # 文章 URL -> 图片 URL 列表, 超过 ttl 视为过期, 超过 max_entries 按最近访问淘汰
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.path = Path(path) if path else default_cache_path()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def get(self, url: str) -> list[str] | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT images, fetched FROM galleries WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE galleries SET atime = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def put(self, url: str, images: list[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO galleries (url, images, fetched, atime) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(images), now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM galleries").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM galleries WHERE url IN"
+                    " (SELECT url FROM galleries ORDER BY atime LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM galleries")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> str:
+        return f"hits={self.hits}, misses={self.misses}"
@@ -0,0 +1,292 @@
+import asyncio
+import importlib.util
+import os
+import random
+from collections.abc import Callable
+from contextlib import nullcontext
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import httpx
+from blake3 import blake3
+
+from quv.mdp.index import PART_SUFFIX, FolderIndex
+from quv.mdp.writer import BufferedFileWriter, resume_offset
+from quv.utils.limiter import AdaptiveLimiter, Slot
+
+CHUNK_SIZE = 65536
+RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+DEDUPE_LINK = "link"
+DEDUPE_SKIP = "skip"
+MAX_CONNECTIONS = 64
+VALIDATOR_SUFFIX = ".validator"
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def part_path(dst: Path) -> Path:
+    return dst.with_name(dst.name + PART_SUFFIX)
+
+
+def validator_path(part: Path) -> Path:
+    return part.with_name(part.name + VALIDATOR_SUFFIX)
+
+
+def load_validator(part: Path) -> str | None:
+    try:
+        return validator_path(part).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def save_validator(part: Path, resp: httpx.Response) -> None:
+    # 记下写入 .part 时资源的版本, 续传时作为 If-Range; If-Range 只接受强 ETag
+    etag = resp.headers.get("ETag", "")
+    value = etag if etag and not etag.startswith("W/") else resp.headers.get("Last-Modified")
+    if value:
+        validator_path(part).write_text(value, encoding="utf-8")
+    else:
+        validator_path(part).unlink(missing_ok=True)
+
+
+def hash_part(part: Path) -> blake3:
+    hasher = blake3()
+    with part.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            hasher.update(chunk)
+    return hasher
+
+
+def validators(resp: httpx.Response) -> dict:
+    meta = {}
+    if etag := resp.headers.get("ETag"):
+        meta["etag"] = etag
+    if last_modified := resp.headers.get("Last-Modified"):
+        meta["last_modified"] = last_modified
+    return meta
+
+
+def conditional_headers(entry: dict) -> dict:
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def finalize(
+    part: Path,
+    dst: Path,
+    digest: str,
+    size: int,
+    index: FolderIndex | None,
+    dedupe: str,
+    meta: dict | None = None,
+) -> tuple[Path, str]:
+    meta = meta or {}
+    validator_path(part).unlink(missing_ok=True)
+    existing = index.lookup(digest) if index else None
+    if existing == dst and dst.exists():
+        # 重新同步时服务器没有返回 304, 但内容未变
+        part.unlink(missing_ok=True)
+        index.add(dst.name, digest, size, **meta)
+        return dst, "Unchanged"
+    if existing is None or not existing.exists():
+        os.replace(part, dst)
+        if index:
+            index.add(dst.name, digest, size, **meta)
+        return dst, "Saved"
+
+    # 内容已存在: 丢弃本次数据, 按配置硬链接到已有文件或直接跳过
+    part.unlink(missing_ok=True)
+    if dedupe == DEDUPE_LINK:
+        try:
+            dst.unlink(missing_ok=True)
+            os.link(existing, dst)
+            index.add(dst.name, digest, size, **meta)
+            return existing, "Linked"
+        except OSError:
+            pass
+    if dst.name in index.files:
+        index.drop(dst.name)
+    else:
+        index.release(dst.name)
+    return existing, "Duplicate"
+
+
+def backoff_delay(attempt: int, resp: httpx.Response | None = None) -> float:
+    if resp is not None:
+        retry_after = resp.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(BACKOFF_MAX, float(retry_after))
+    # 指数退避 + 全抖动
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def retry_delay(err: Exception, attempt: int) -> float | None:
+    if attempt >= RETRIES:
+        return None
+    if isinstance(err, httpx.HTTPStatusError):
+        if err.response.status_code not in TRANSIENT_STATUS:
+            return None
+        return backoff_delay(attempt, err.response)
+    if isinstance(err, httpx.TransportError):
+        return backoff_delay(attempt)
+    return None
+
+
+def make_client(**kwargs) -> httpx.AsyncClient:
+    # h2 随 httpx[http2] 安装, 同一主机的请求在一条连接上多路复用; 缺少 h2 时回退到 HTTP/1.1
+    return httpx.AsyncClient(
+        timeout=30.0,
+        follow_redirects=True,
+        http2=HTTP2,
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=32),
+        **kwargs,
+    )
+
+
+async def download_image(
+    client: httpx.AsyncClient,
+    url: str,
+    dst: Path,
+    limiter: AdaptiveLimiter | None = None,
+    index: FolderIndex | None = None,
+    dedupe: str = DEDUPE_LINK,
+    known: dict | None = None,
+) -> tuple[Path, str, int]:
+    # known 为索引中该 URL 的已有条目, 带上条件请求头, 未修改时服务器返回 304
+    part = part_path(dst)
+    attempt = 0
+    while True:
+        offset = resume_offset(part)
+        validator = load_validator(part) if offset else None
+        if offset and validator is None:
+            # 不知道 .part 是哪个版本的内容, 不能安全续传, 从头下载
+            part.unlink(missing_ok=True)
+            offset = 0
+        if offset:
+            # 资源已变化时服务器忽略 Range 返回 200 全量内容
+            headers = {"Range": f"bytes={offset}-", "If-Range": validator}
+        else:
+            headers = conditional_headers(known) if known else {}
+        try:
+            async with (
+                limiter.slot(url) if limiter else nullcontext(Slot()) as slot,
+                client.stream("GET", url, headers=headers) as resp,
+            ):
+                slot.mark_response(resp.status_code)
+                meta = {"url": url, **validators(resp)}
+                if resp.status_code == 304 and known:
+                    if index:
+                        # 304 也可能带回新的校验头
+                        kept = {k: v for k, v in known.items() if k not in ("blake3", "size")}
+                        index.add(dst.name, known["blake3"], known["size"], **{**kept, **meta})
+                    return dst, "Unchanged", 0
+                if resp.status_code == 416 and offset:
+                    # .part 可能已经完整, 按 Content-Range 中的总长度判断
+                    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit() and int(total) == offset:
+                        digest = hash_part(part).hexdigest()
+                        meta = {"url": url}
+                        return (*finalize(part, dst, digest, offset, index, dedupe, meta), offset)
+                    part.unlink(missing_ok=True)
+                    validator_path(part).unlink(missing_ok=True)
+                    continue
+                resp.raise_for_status()
+
+                if resp.status_code != 206:
+                    offset = 0
+                    await asyncio.to_thread(save_validator, part, resp)
+                # 边下载边计算 blake3, 续传时先补算已有部分
+                hasher = hash_part(part) if offset else blake3()
+                total_bytes = offset
+                length = resp.headers.get("Content-Length")
+                expected = offset + int(length) if length and length.isdigit() else None
+                async with BufferedFileWriter(part, offset, expected) as f:
+                    async for chunk in resp.aiter_bytes(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            await f.write(chunk)
+                            hasher.update(chunk)
+                            total_bytes += len(chunk)
+                slot.nbytes = total_bytes - offset
+
+            return (
+                *finalize(part, dst, hasher.hexdigest(), total_bytes, index, dedupe, meta),
+                total_bytes,
+            )
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            delay = retry_delay(e, attempt)
+            if delay is None:
+                raise
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def image_name(url: str, idx: int) -> str:
+    parsed = urlparse(url)
+    return os.path.basename(unquote(parsed.path)) or f"image_{idx}"
+
+
+async def download_all(
+    client: httpx.AsyncClient,
+    image_urls: list[str],
+    folder: str | Path,
+    limiter: AdaptiveLimiter,
+    dedupe: str = DEDUPE_LINK,
+    log: Callable[[str], None] | None = None,
+) -> dict:
+    total = len(image_urls)
+    result = {
+        "messages": [],
+        "saved": 0,
+        "duplicates": 0,
+        "unchanged": 0,
+        "failed": 0,
+        "bytes": 0,
+    }
+    index = FolderIndex(folder)
+    resynced: set[str] = set()
+
+    async def download_one(idx: int, img_url: str) -> str:
+        try:
+            # 之前下载过的 URL 写回原文件并发条件请求, 其余分配新文件名
+            found = index.find_url(img_url)
+            if found and found[0].name not in resynced:
+                dst, known = found
+                resynced.add(dst.name)
+            else:
+                dst, known = index.claim(image_name(img_url, idx), img_url), None
+            path, state, total_bytes = await download_image(
+                client, img_url, dst, limiter, index, dedupe, known
+            )
+            result["bytes"] += total_bytes
+            if state == "Unchanged":
+                result["unchanged"] += 1
+                return f"[{idx}/{total}] Unchanged: {dst}"
+            if state == "Saved":
+                result["saved"] += 1
+                return f"[{idx}/{total}] Saved: {dst} ({total_bytes} bytes)"
+            result["duplicates"] += 1
+            if state == "Linked":
+                return f"[{idx}/{total}] Linked: {dst} -> {path}"
+            return f"[{idx}/{total}] Duplicate skipped: {img_url} (same as {path})"
+        except Exception as e:
+            result["failed"] += 1
+            return f"[{idx}/{total}] Failed: {img_url} -> {e}"
+
+    tasks = [
+        asyncio.create_task(download_one(idx, url)) for idx, url in enumerate(image_urls, start=1)
+    ]
+    try:
+        for coro in asyncio.as_completed(tasks):
+            msg = await coro
+            result["messages"].append(msg)
+            if log:
+                log(msg)
+    finally:
+        index.save()
+    return result
@@ -0,0 +1,109 @@
+import json
+import os
+from pathlib import Path
+
+INDEX_NAME = ".quv_index.json"
+INDEX_VERSION = 1
+PART_SUFFIX = ".part"
+
+
+class FolderIndex:
+    # 下载目录的内容索引: 文件名 -> blake3/大小/来源 URL/校验头, 用于去重, 分配文件名和增量同步
+    def __init__(self, folder: str | Path):
+        self.folder = Path(folder)
+        self.path = self.folder / INDEX_NAME
+        self.names: set[str] = set()
+        self.files: dict[str, dict] = {}
+        self.by_digest: dict[str, str] = {}
+        self.by_url: dict[str, str] = {}
+        self._next_suffix: dict[str, int] = {}
+        self._load()
+
+    def _load(self):
+        with os.scandir(self.folder) as it:
+            self.names = {entry.name for entry in it}
+
+        try:
+            with self.path.open(encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        if data.get("version") != INDEX_VERSION:
+            data = {}
+
+        for name, entry in data.get("files", {}).items():
+            if name in self.names:
+                self.files[name] = entry
+                self.by_digest.setdefault(entry["blake3"], name)
+                if entry.get("url"):
+                    self.by_url[entry["url"]] = name
+
+    def claim(self, name: str, url: str | None = None) -> Path:
+        stem, suffix = os.path.splitext(name)
+        k = self._next_suffix.get(name, 0)
+        while True:
+            candidate = name if k == 0 else f"{stem}_{k}{suffix}"
+            k += 1
+            # 存在未完成的 .part 时续传, 而不是另存为新文件;
+            # 同名文件已存在时 .part 是它的重新同步, 只有同一 URL 才能接着用, 否则会覆盖无关的图片
+            part = candidate + PART_SUFFIX
+            owner = self.files.get(candidate, {}).get("url")
+            if part in self.names and (candidate not in self.names or (url and owner == url)):
+                self.names.discard(part)
+                self.names.add(candidate)
+                break
+            if candidate not in self.names:
+                self.names.add(candidate)
+                break
+        self._next_suffix[name] = k
+        return self.folder / candidate
+
+    def release(self, name: str) -> None:
+        if name not in self.files:
+            self.names.discard(name)
+
+    def drop(self, name: str) -> None:
+        self._forget(name)
+        self.names.discard(name)
+
+    def lookup(self, digest: str) -> Path | None:
+        name = self.by_digest.get(digest)
+        return self.folder / name if name else None
+
+    def find_url(self, url: str) -> tuple[Path, dict] | None:
+        # 之前从该 URL 保存过且文件仍完好时返回 (路径, 索引条目)
+        name = self.by_url.get(url)
+        if name is None:
+            return None
+        entry = self.files[name]
+        path = self.folder / name
+        try:
+            if path.stat().st_size != entry["size"]:
+                return None
+        except OSError:
+            return None
+        return path, entry
+
+    def _forget(self, name: str) -> None:
+        old = self.files.pop(name, None)
+        if old is None:
+            return
+        if self.by_digest.get(old["blake3"]) == name:
+            del self.by_digest[old["blake3"]]
+        if old.get("url") and self.by_url.get(old["url"]) == name:
+            del self.by_url[old["url"]]
+
+    def add(self, name: str, digest: str, size: int, **extra) -> None:
+        # 同名文件被重新同步时先清掉旧条目的摘要和 URL 映射
+        self._forget(name)
+        self.files[name] = {"blake3": digest, "size": size, **extra}
+        self.by_digest.setdefault(digest, name)
+        if extra.get("url"):
+            self.by_url[extra["url"]] = name
+        self.names.add(name)
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
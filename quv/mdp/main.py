@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from pymdp.pymdp import MdprMedia
+
+from quv.mdp.archive import ARCHIVE_FORMATS, archive_all
+from quv.mdp.cache import DEFAULT_TTL, GalleryCache
+from quv.mdp.download import DEDUPE_LINK, DEDUPE_SKIP, download_all, make_client
+from quv.utils.limiter import AdaptiveLimiter
+
+QUEUE_SIZE = 4
+DOWNLOAD_WORKERS = 2
+
+
+async def get_images(
+    url: str, cache: GalleryCache | None = None, refresh: bool = False
+) -> list[str]:
+    if cache is not None and not refresh:
+        cached = cache.get(url)
+        if cached is not None:
+            return cached
+
+    async with MdprMedia(url) as mdpr:
+        image_index = await mdpr.get_image_index()
+        images = await mdpr.get_image_urls(image_index) if image_index else []
+
+    if cache is not None and images:
+        cache.put(url, images)
+    return images
+
+
+def is_valid_url(url: str) -> bool:
+    if not url:
+        return False
+    parsed = urlparse(url.strip())
+    return parsed.scheme in ("http", "https") and bool(parsed.netloc)
+
+
+def article_name(url: str) -> str:
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    return parts[-1] if parts else urlparse(url).netloc
+
+
+def article_folder(root: Path, url: str) -> Path:
+    folder = root / article_name(url)
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def article_archive(root: Path, url: str, fmt: str) -> Path:
+    return root / f"{article_name(url)}.{fmt}"
+
+
+async def close_media(mdpr: MdprMedia, url: str) -> None:
+    # __aenter__ 失败后 __aexit__ 也可能出错, 只记录, 不影响批次中的其他文章
+    try:
+        await mdpr.__aexit__(None, None, None)
+    except Exception as e:
+        print(f"[close] {url}: {e}", file=sys.stderr)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.nbytes = 0
+        self.busy = 0.0
+        self.first: float | None = None
+        self.last: float | None = None
+
+    def record(self, start: float, ok: bool = True, nbytes: int = 0):
+        end = time.perf_counter()
+        self.first = start if self.first is None else self.first
+        self.last = end
+        self.busy += end - start
+        self.items += 1
+        self.errors += 0 if ok else 1
+        self.nbytes += nbytes
+
+    def summary(self) -> str:
+        wall = (self.last - self.first) if self.first is not None else 0.0
+        rate = self.items / wall if wall > 0 else 0.0
+        msg = (
+            f"{self.name}: {self.items} items ({self.errors} errors), "
+            f"busy {self.busy:.3f}s, wall {wall:.3f}s, {rate:.2f} items/s"
+        )
+        if self.nbytes:
+            mb = self.nbytes / (1024 * 1024)
+            msg += f", {mb:.2f} MB ({mb / wall if wall > 0 else 0.0:.2f} MB/s)"
+        return msg
+
+
+async def run_pipeline(
+    urls: list[str],
+    root: Path,
+    dedupe: str = DEDUPE_LINK,
+    workers: int = DOWNLOAD_WORKERS,
+    cache: GalleryCache | None = None,
+    refresh: bool = False,
+    archive: str | None = None,
+) -> list[StageStats]:
+    index_stats = StageStats("index")
+    urls_stats = StageStats("urls")
+    download_stats = StageStats("download")
+
+    # 有界队列串起三个阶段: 当前文章下载时, 下一篇文章的解析已经在进行
+    index_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+    urls_queue: asyncio.Queue = asyncio.Queue(QUEUE_SIZE)
+
+    async def index_stage():
+        for url in urls:
+            # 缓存命中时跳过前两个阶段的网络请求
+            cached = cache.get(url) if cache is not None and not refresh else None
+            if cached is not None:
+                await index_queue.put((url, None, cached))
+                continue
+
+            start = time.perf_counter()
+            mdpr = MdprMedia(url)
+            try:
+                await mdpr.__aenter__()
+                image_index = await mdpr.get_image_index()
+            except Exception as e:
+                print(f"[index] {url}: {e}", file=sys.stderr)
+                await close_media(mdpr, url)
+                index_stats.record(start, ok=False)
+                continue
+            index_stats.record(start)
+            await index_queue.put((url, mdpr, image_index))
+        await index_queue.put(None)
+
+    async def urls_stage():
+        while (item := await index_queue.get()) is not None:
+            url, mdpr, image_index = item
+            if mdpr is None:
+                image_urls = image_index
+                print(f"[urls] {url}: {len(image_urls)} images (cache hit)", file=sys.stderr)
+                await urls_queue.put((url, image_urls))
+                continue
+
+            start = time.perf_counter()
+            try:
+                image_urls = await mdpr.get_image_urls(image_index) if image_index else []
+                urls_stats.record(start)
+                if cache is not None and image_urls:
+                    cache.put(url, image_urls)
+            except Exception as e:
+                print(f"[urls] {url}: {e}", file=sys.stderr)
+                urls_stats.record(start, ok=False)
+                continue
+            finally:
+                await close_media(mdpr, url)
+            print(f"[urls] {url}: {len(image_urls)} images", file=sys.stderr)
+            if image_urls:
+                await urls_queue.put((url, image_urls))
+        for _ in range(workers):
+            await urls_queue.put(None)
+
+    async def download_stage(client, limiter):
+        while (item := await urls_queue.get()) is not None:
+            url, image_urls = item
+            start = time.perf_counter()
+            # 打开归档或扫描目录失败时只算这篇文章出错, 其余文章继续下载
+            try:
+                if archive:
+                    path = article_archive(root, url, archive)
+                    result = await archive_all(client, image_urls, path, limiter, archive)
+                else:
+                    folder = article_folder(root, url)
+                    result = await download_all(client, image_urls, folder, limiter, dedupe)
+            except Exception as e:
+                print(f"[download] {url}: {e}", file=sys.stderr)
+                download_stats.record(start, ok=False)
+                continue
+            download_stats.record(start, ok=not result["failed"], nbytes=result["bytes"])
+            for msg in result["messages"]:
+                print(msg)
+            print(
+                f"[download] {url}: saved {result['saved']}, duplicates {result['duplicates']}, "
+                f"unchanged {result['unchanged']}, failed {result['failed']}",
+                file=sys.stderr,
+            )
+
+    limiter = AdaptiveLimiter()
+    async with make_client() as client:
+        await asyncio.gather(
+            index_stage(),
+            urls_stage(),
+            *(download_stage(client, limiter) for _ in range(workers)),
+        )
+
+    return [index_stats, urls_stats, download_stats]
+
+
+def read_urls(args) -> list[str]:
+    lines: list[str] = list(args.urls)
+    if args.input == "-" or (not args.input and not lines):
+        lines += sys.stdin.read().splitlines()
+    elif args.input:
+        with open(args.input, encoding="utf-8") as f:
+            lines += f.read().splitlines()
+
+    urls = []
+    for line in lines:
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        if not is_valid_url(s):
+            print(f"Skip invalid URL: {s}", file=sys.stderr)
+            continue
+        urls.append(s)
+    return urls
+
+
+def get_args_parser():
+    parser = argparse.ArgumentParser(description="mdpr gallery batch downloader")
+    parser.add_argument("urls", nargs="*", help="article urls")
+    parser.add_argument("-i", dest="input", type=str, help="url list file ('-' for stdin)")
+    parser.add_argument("-o", dest="output", type=str, default=".", help="download directory")
+    parser.add_argument(
+        "-j", dest="workers", type=int, default=DOWNLOAD_WORKERS, help="articles downloaded at once"
+    )
+    parser.add_argument(
+        "--no-link",
+        dest="no_link",
+        action="store_true",
+        help="skip duplicate images instead of hard-linking them",
+    )
+    parser.add_argument(
+        "--archive",
+        dest="archive",
+        choices=ARCHIVE_FORMATS,
+        help="stream each gallery into <article>.zip/.tar instead of separate files",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        dest="cache_ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="seconds a resolved gallery stays cached",
+    )
+    parser.add_argument(
+        "--refresh", dest="refresh", action="store_true", help="ignore cached galleries"
+    )
+    parser.add_argument(
+        "--no-cache", dest="no_cache", action="store_true", help="do not use the gallery cache"
+    )
+    return parser
+
+
+def cli():
+    asyncio.run(main())
+
+
+async def main():
+    args = get_args_parser().parse_args()
+    urls = read_urls(args)
+    if not urls:
+        print("Error: no article urls given")
+        sys.exit(2)
+
+    root = Path(args.output).expanduser().resolve()
+    root.mkdir(parents=True, exist_ok=True)
+    if not os.access(root, os.W_OK):
+        print(f"Error: directory is not writable: {root}", file=sys.stderr)
+        sys.exit(2)
+
+    dedupe = DEDUPE_SKIP if args.no_link else DEDUPE_LINK
+    start = time.perf_counter()
+    cache = None if args.no_cache else GalleryCache(ttl=args.cache_ttl)
+    try:
+        stats = await run_pipeline(
+            urls, root, dedupe, max(1, args.workers), cache, args.refresh, args.archive
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    elapsed = time.perf_counter() - start
+
+    print("----- SUMMARY -----", file=sys.stderr)
+    for stage in stats:
+        print(stage.summary(), file=sys.stderr)
+    summary = f"Articles: {len(urls)}, Elapsed: {elapsed:.3f}s"
+    if cache is not None:
+        summary += f", Cache: {cache.stats()}"
+    print(summary, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
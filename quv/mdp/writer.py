@@ -0,0 +1,108 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BUFFER_SIZE = 4 * 1024 * 1024
+ALLOC_SUFFIX = ".alloc"
+
+# 所有文件共用一个写线程: 每个缓冲区 (而不是每个 64 KiB 块) 切换一次线程
+_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quv-writer")
+
+
+def _pwrite(fd: int, data: bytes | bytearray, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        if hasattr(os, "pwrite"):
+            n = os.pwrite(fd, view, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            n = os.write(fd, view)
+        view = view[n:]
+        offset += n
+
+
+def _preallocate(fd: int, size: int) -> None:
+    try:
+        if hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, size)
+        else:
+            os.ftruncate(fd, size)
+    except OSError:
+        pass
+
+
+def resume_offset(path: str | os.PathLike) -> int:
+    # 预分配标记还在说明上次没有正常关闭, 文件尾部可能是预分配的零, 只能从头开始
+    marker = f"{os.fspath(path)}{ALLOC_SUFFIX}"
+    if os.path.exists(marker):
+        for stale in (path, marker):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+        return 0
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+class BufferedFileWriter:
+    # 先把响应块攒进大缓冲区, 满了再整体交给写线程用 pwrite 落盘, 同时保留一个在途写入
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        offset: int = 0,
+        total_size: int | None = None,
+        buffer_size: int = BUFFER_SIZE,
+    ):
+        flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        if not offset:
+            flags |= os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+        self.pos = offset
+        self.buffer_size = buffer_size
+        self._buf = bytearray()
+        self._pending: asyncio.Future | None = None
+        self._marker = f"{os.fspath(path)}{ALLOC_SUFFIX}"
+        # 一个缓冲区就能写完的小文件不需要预分配
+        self._preallocated = bool(total_size) and total_size - offset > buffer_size
+        if self._preallocated:
+            open(self._marker, "wb").close()
+            _preallocate(self.fd, total_size)
+
+    async def write(self, data: bytes) -> None:
+        self._buf += data
+        if len(self._buf) >= self.buffer_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        if not self._buf:
+            return
+        data, self._buf = self._buf, bytearray()
+        loop = asyncio.get_running_loop()
+        self._pending = loop.run_in_executor(_WRITER, _pwrite, self.fd, data, self.pos)
+        self.pos += len(data)
+
+    async def close(self) -> None:
+        try:
+            await self._flush()
+            if self._pending is not None:
+                await self._pending
+                self._pending = None
+            if self._preallocated:
+                # 实际长度可能小于预分配长度, 截断到真实写入位置
+                os.ftruncate(self.fd, self.pos)
+        finally:
+            os.close(self.fd)
+        if self._preallocated:
+            os.unlink(self._marker)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,9 +1,16 @@
 import argparse
 import os
+import re
 import sys
+from collections.abc import Iterable, Iterator
 from configparser import ConfigParser
 from pathlib import Path
 
+# 文件名 = 标题 + 分隔符 + 集数/扩展名; 先找 ".ep", 没有再找 "_ep_", 都取第一次出现的位置
+EPISODE_PATTERN = re.compile(
+    r"(?P<title>.*?)\.ep(?P<rest>.*)|(?P<title2>.*?)_ep_(?P<rest2>.*)", re.I | re.S
+)
+
 
 def read_config(config: Path):
     if not config.exists():
@@ -19,73 +26,82 @@ def read_config(config: Path):
         raise (e)
 
 
-def parse_tmdb(tmdb_mapping: dict, files: list[Path]):
-    videos: list[dict] = []
+def normalize_title(title: str) -> str:
+    return title.lower().strip()
+
 
-    if not files or not tmdb_mapping:
-        return videos
+def build_index(tmdb_mapping: dict) -> dict[str, str]:
+    # 规范化后的标题 -> 新标题, 同一标题出现多次时保留第一个
+    index: dict[str, str] = {}
+    for key, value in tmdb_mapping.items():
+        index.setdefault(normalize_title(key), value)
+    return index
 
-    separators = [".ep", "_ep_"]
 
+def parse_tmdb(tmdb_mapping: dict, files: Iterable[Path]) -> Iterator[dict]:
+    if not tmdb_mapping:
+        return
+
+    index = build_index(tmdb_mapping)
     for file in files:
-        file_name = file.name
-        file_root = file.parent
-
-        name_lower = file_name.lower()
-        found = False
-        for sep in separators:
-            if sep in name_lower:
-                idx = name_lower.find(sep)
-                old_title = file_name[:idx]
-                suffix = file_name[idx + len(sep) :]
-                found = True
-                break
-        if not found:
+        match = EPISODE_PATTERN.fullmatch(file.name)
+        if match is None:
             continue
+        if match["title"] is not None:
+            old_title, suffix = match["title"], match["rest"]
+        else:
+            old_title, suffix = match["title2"], match["rest2"]
 
         old_title = old_title.rstrip("._- ").strip()
         ep_str, ext = os.path.splitext(suffix)
 
-        norm_old_title = old_title.lower().strip()
-        for tmdb_key, tmdb_value in tmdb_mapping.items():
-            if norm_old_title == tmdb_key.lower().strip():
-                new_title = tmdb_value if tmdb_value else f"{old_title}.S01"
-                new_filename = f"{new_title}EP{ep_str}{ext}"
-                new_filepath = file_root / new_filename
-                videos.append({"old_filepath": str(file), "new_filepath": str(new_filepath)})
-                break
-        else:
-            new_title = f"{old_title}.S01"
-            new_filename = f"{new_title}EP{ep_str}{ext}"
-            new_filepath = file_root / new_filename
-            videos.append({"old_filepath": str(file), "new_filepath": str(new_filepath)})
-
-    return videos
+        new_title = index.get(normalize_title(old_title)) or f"{old_title}.S01"
+        new_filepath = file.parent / f"{new_title}EP{ep_str}{ext}"
+        yield {"old_filepath": str(file), "new_filepath": str(new_filepath)}
 
 
-def get_files(filepath: str):
+def iter_files(rootpath: str, recursive: bool = False) -> Iterator[Path]:
+    # os.scandir 的 DirEntry 自带文件类型, 不必对每个条目单独 stat
+    stack = [rootpath]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError as e:
+            print(f"Error: cannot read directory: {current}: {e}")
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        yield Path(entry.path)
+                    elif recursive and entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                except OSError:
+                    continue
+
+
+def get_files(filepath: str, recursive: bool = False) -> Iterator[Path]:
     if not os.path.exists(filepath):
         print(f"Error: file does not exist: {filepath}")
         sys.exit(2)
 
-    files: list[Path] = []
     if os.path.isdir(filepath):
-        rootpath = os.path.abspath(filepath)
-        entries = [os.path.join(rootpath, f) for f in os.listdir(rootpath)]
-        for entry in entries:
-            if os.path.isfile(entry):
-                files.append(Path(os.path.join(rootpath, entry)))
-        return files
-    else:
-        files.append(Path(filepath))
-
-    return files
+        return iter_files(os.path.abspath(filepath), recursive)
+    return iter([Path(filepath)])
 
 
 def get_args_parser():
     parser = argparse.ArgumentParser(description="TMDB File Renamer")
     parser.add_argument("-c", dest="config", type=str, help="ini config file")
     parser.add_argument("-f", dest="filepath", type=str, help="file or directory")
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        dest="recursive",
+        action="store_true",
+        help="also rename files in subdirectories",
+    )
     parser.add_argument(
         "--dry-run",
         dest="dry_run",
@@ -113,9 +129,12 @@ def main():
             print("Error: no TMDB mapping found in config")
             sys.exit(2)
 
-        files = get_files(filepath)
-        tasks = parse_tmdb(tmdb_mapping, files)
-        for task in tasks:
+        files = get_files(filepath, args.recursive)
+        # 边扫描边重命名, 记下本次生成的目标, 避免改名后的文件被扫描到时再处理一次
+        renamed: set[str] = set()
+        for task in parse_tmdb(tmdb_mapping, files):
+            if task["old_filepath"] in renamed:
+                continue
             old = Path(task["old_filepath"])
             new = Path(task["new_filepath"])
             print(f"{old} -> {new}")
@@ -129,6 +148,7 @@ def main():
                 continue
             try:
                 os.rename(str(old), str(new))
+                renamed.add(task["new_filepath"])
             except Exception as e:
                 print(f"Error renaming {old} -> {new}: {e}")
     else:
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from quv.utils.cache import cache_dir
+
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    url TEXT PRIMARY KEY,
+    trackers TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mirrors (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    samples TEXT NOT NULL DEFAULT '[]'
+);
+"""
+
+MAX_SAMPLES = 20
+HEDGE_DELAY = 1.0
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN = 0.1
+HEDGE_MAX = 10.0
+
+
+def default_cache_path() -> Path:
+    return cache_dir("tracker") / "sources.db"
+
+
+class SourceCache:
+    # sources: 来源 -> 上次成功解析的 tracker 集合, 用于离线回退
+    # mirrors: 镜像 URL -> 校验头和最近的响应耗时, 用于条件请求, 镜像排序和对冲阈值
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else default_cache_path()
+        self.hits = 0
+        self.fallbacks = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            # 只是缓存, 结构变化时直接重建
+            self._conn.executescript("DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS mirrors;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(SCHEMA)
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT trackers, fetched FROM sources WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"trackers": set(json.loads(row[0])), "fetched": row[1]}
+
+    def put(self, url: str, trackers: set[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (url, trackers, fetched) VALUES (?, ?, ?)",
+                (url, json.dumps(sorted(trackers)), time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            self._conn.execute("UPDATE sources SET fetched = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def validators(self, url: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM mirrors WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not any(row):
+            return None
+        return {"etag": row[0], "last_modified": row[1]}
+
+    def put_validators(self, url: str, etag: str | None, last_modified: str | None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO mirrors (url, etag, last_modified) VALUES (?, ?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET etag = excluded.etag,"
+                " last_modified = excluded.last_modified",
+                (url, etag, last_modified),
+            )
+            self._conn.commit()
+
+    def _samples(self, url: str) -> list[float]:
+        row = self._conn.execute("SELECT samples FROM mirrors WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def record(self, url: str, seconds: float) -> None:
+        with self._lock:
+            samples = (self._samples(url) + [round(seconds, 4)])[-MAX_SAMPLES:]
+            self._conn.execute(
+                "INSERT INTO mirrors (url, samples) VALUES (?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET samples = excluded.samples",
+                (url, json.dumps(samples)),
+            )
+            self._conn.commit()
+
+    def rank(self, mirrors: list[str]) -> list[str]:
+        # 按历史耗时中位数排序, 没有记录的镜像保持配置顺序排在最后
+        with self._lock:
+            medians = {url: self._samples(url) for url in mirrors}
+        order = {url: i for i, url in enumerate(mirrors)}
+
+        def key(url: str):
+            samples = medians[url]
+            return (0, statistics.median(samples), 0) if samples else (1, 0.0, order[url])
+
+        return sorted(mirrors, key=key)
+
+    def hedge_delay(self, url: str) -> float:
+        # 主镜像耗时的 p90 作为对冲阈值: 超过它还没响应就向下一个镜像再发一次
+        with self._lock:
+            samples = sorted(self._samples(url))
+        if len(samples) < 2:
+            return HEDGE_DELAY
+        delay = samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE))]
+        return min(HEDGE_MAX, max(HEDGE_MIN, delay))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("DELETE FROM mirrors")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> str:
+        return f"not-modified={self.hits}, fallbacks={self.fallbacks}, hedged={self.hedges}"
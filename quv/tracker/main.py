@@ -1,25 +1,53 @@
+import argparse
 import asyncio
 import os
 import sys
+import time
 from pathlib import Path
 
 import httpx
 
-TRACKER_URLS = [
+from quv.tracker.cache import HEDGE_DELAY, SourceCache
+from quv.tracker.probe import PROBE_CONCURRENCY, PROBE_TIMEOUT, probe_all
+from quv.tracker.server import DEFAULT_HOST, DEFAULT_PORT, REFRESH_INTERVAL, TrackerListServer
+
+# 每个来源一组镜像, 按历史耗时排序后依次对冲请求
+TRACKER_SOURCES = [
     # https://github.com/ngosang/trackerslist
-    "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_best_ip.txt",
+    [
+        "https://raw.githubusercontent.com/ngosang/trackerslist/master/trackers_best_ip.txt",
+        "https://cdn.jsdelivr.net/gh/ngosang/trackerslist@master/trackers_best_ip.txt",
+        "https://ngosang.github.io/trackerslist/trackers_best_ip.txt",
+    ],
     # https://trackerslist.com/#/zh
-    "https://raw.githubusercontent.com/XIU2/TrackersListCollection/refs/heads/master/best.txt",
+    [
+        "https://raw.githubusercontent.com/XIU2/TrackersListCollection/refs/heads/master/best.txt",
+        "https://cdn.jsdelivr.net/gh/XIU2/TrackersListCollection@master/best.txt",
+    ],
     # https://github.com/DeSireFire/animeTrackerList
-    "https://raw.githubusercontent.com/DeSireFire/animeTrackerList/master/AT_best.txt",
+    [
+        "https://raw.githubusercontent.com/DeSireFire/animeTrackerList/master/AT_best.txt",
+        "https://cdn.jsdelivr.net/gh/DeSireFire/animeTrackerList@master/AT_best.txt",
+    ],
 ]
+FAIL_PENALTY = 30.0
 
 
-async def fast_get(client: httpx.AsyncClient, url: str) -> str | None:
+async def fast_get(
+    client: httpx.AsyncClient, url: str, cached: dict | None = None
+) -> httpx.Response | None:
+    # 有缓存时带上条件请求头, 未修改时服务器返回 304
+    headers = {}
+    if cached and cached["etag"]:
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached["last_modified"]:
+        headers["If-Modified-Since"] = cached["last_modified"]
     try:
-        resp = await client.get(url)
+        resp = await client.get(url, headers=headers)
+        if resp.status_code == 304 and cached:
+            return resp
         resp.raise_for_status()
-        return resp.text
+        return resp
     except httpx.HTTPError as err:
         print(f"get tracker url error: {err} (url={url})")
         return None
@@ -28,6 +56,101 @@ async def fast_get(client: httpx.AsyncClient, url: str) -> str | None:
         return None
 
 
+async def fetch_mirror(
+    client: httpx.AsyncClient, url: str, cache: SourceCache | None, conditional: bool
+) -> tuple[httpx.Response, set[str] | None] | None:
+    # 返回 (响应, 解析结果), 304 时解析结果为 None; 失败或内容无法解析时返回 None
+    validators = cache.validators(url) if cache is not None and conditional else None
+    resp = await fast_get(client, url, validators)
+    if resp is None:
+        return None
+    if resp.status_code == 304:
+        return resp, None
+    trackers = parse_tracker(resp.text)
+    if not trackers:
+        print(f"no trackers in response (url={url})")
+        return None
+    return resp, trackers
+
+
+async def hedged_get(
+    client: httpx.AsyncClient,
+    mirrors: list[str],
+    cache: SourceCache | None = None,
+    conditional: bool = False,
+) -> tuple[str, httpx.Response, set[str] | None] | None:
+    # 先请求最快的镜像, 超过对冲阈值仍未返回时再请求下一个, 失败则立即换下一个;
+    # 取最先成功的结果并取消其余请求
+    order = cache.rank(mirrors) if cache is not None else list(mirrors)
+    delay = cache.hedge_delay(order[0]) if cache is not None else HEDGE_DELAY
+    pending: dict[asyncio.Task, tuple[str, float]] = {}
+
+    def launch():
+        url = order.pop(0)
+        task = asyncio.create_task(fetch_mirror(client, url, cache, conditional))
+        pending[task] = (url, time.perf_counter())
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=delay if order else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                if cache is not None:
+                    cache.hedges += 1
+                launch()
+                continue
+            for task in done:
+                url, start = pending.pop(task)
+                result = task.result()
+                if result is not None:
+                    if cache is not None:
+                        cache.record(url, time.perf_counter() - start)
+                    return url, *result
+                if cache is not None:
+                    cache.record(url, FAIL_PENALTY)
+                if order:
+                    launch()
+        return None
+    finally:
+        # 被取消的镜像至少有这么慢, 记下来供下次排序
+        now = time.perf_counter()
+        for task, (url, start) in pending.items():
+            task.cancel()
+            if cache is not None:
+                cache.record(url, now - start)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def get_source(
+    client: httpx.AsyncClient, mirrors: list[str], cache: SourceCache | None = None
+) -> set[str]:
+    # 以第一个镜像作为来源的缓存键
+    key = mirrors[0]
+    cached = cache.get(key) if cache is not None else None
+    result = await hedged_get(client, mirrors, cache, conditional=cached is not None)
+
+    if result is not None:
+        url, resp, trackers = result
+        if trackers is None:
+            cache.hits += 1
+            cache.touch(key)
+            return cached["trackers"]
+        if cache is not None:
+            cache.put(key, trackers)
+            cache.put_validators(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return trackers
+
+    # 所有镜像都失败时回退到上次成功的结果
+    if cached:
+        cache.fallbacks += 1
+        fetched = time.strftime("%Y-%m-%d %H:%M", time.localtime(cached["fetched"]))
+        print(f"using cached trackers from {fetched} (url={key})")
+        return cached["trackers"]
+    return set()
+
+
 def parse_tracker(body: str) -> set[str]:
     trackers: set[str] = set()
     if not body:
@@ -39,7 +162,8 @@ def parse_tracker(body: str) -> set[str]:
             continue
         s_lower = s.lower()
         if not (
-            s_lower.startswith("tcp://")
+            s_lower.startswith("udp://")
+            or s_lower.startswith("tcp://")
             or s_lower.startswith("http://")
             or s_lower.startswith("https://")
         ):
@@ -48,17 +172,15 @@ def parse_tracker(body: str) -> set[str]:
     return trackers
 
 
-async def get_tracker_list() -> list[str]:
+async def get_tracker_list(cache: SourceCache | None = None) -> list[str]:
     trackers: set[str] = set()
 
     async with httpx.AsyncClient(timeout=30) as client:
-        tasks = [fast_get(client, url) for url in TRACKER_URLS]
+        tasks = [get_source(client, mirrors, cache) for mirrors in TRACKER_SOURCES]
         results = await asyncio.gather(*tasks)
 
-        for body in results:
-            if not body:
-                continue
-            trackers |= parse_tracker(body)
+        for source in results:
+            trackers |= source
 
     trackers_sorted = sorted(trackers)
     return trackers_sorted
@@ -70,12 +192,8 @@ def save_to_file(trackers: list[str], filepath: Path) -> None:
         f.write(data)
 
 
-def get_folder() -> Path:
-    if len(sys.argv) < 2:
-        print("Error: missing required directory argument")
-        sys.exit(2)
-
-    root = Path(sys.argv[1]).expanduser().resolve()
+def get_folder(path: str) -> Path:
+    root = Path(path).expanduser().resolve()
     if not root.exists():
         print(f"Error: directory does not exist: {root}", file=sys.stderr)
         sys.exit(2)
@@ -91,20 +209,130 @@ def get_folder() -> Path:
     return root
 
 
+def add_source_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--no-cache", dest="no_cache", action="store_true", help="do not use the source cache"
+    )
+    parser.add_argument(
+        "--clear-cache", dest="clear_cache", action="store_true", help="clear the source cache"
+    )
+    parser.add_argument(
+        "--no-probe",
+        dest="no_probe",
+        action="store_true",
+        help="keep every tracker, sorted by url, without probing",
+    )
+    parser.add_argument(
+        "--probe-timeout",
+        dest="probe_timeout",
+        type=float,
+        default=PROBE_TIMEOUT,
+        help=f"seconds per probe (default: {PROBE_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--probe-concurrency",
+        dest="probe_concurrency",
+        type=int,
+        default=PROBE_CONCURRENCY,
+        help=f"probes in flight at once (default: {PROBE_CONCURRENCY})",
+    )
+
+
+def get_args_parser():
+    parser = argparse.ArgumentParser(
+        description="get bt tracker list", epilog="run `qtracker serve -h` for the local endpoint"
+    )
+    parser.add_argument("folder", help="directory to write tracker.txt into")
+    add_source_args(parser)
+    return parser
+
+
+def get_serve_parser():
+    parser = argparse.ArgumentParser(
+        prog="qtracker serve", description="serve the merged tracker list over http"
+    )
+    parser.add_argument(
+        "--host", default=DEFAULT_HOST, help=f"bind address (default: {DEFAULT_HOST})"
+    )
+    parser.add_argument(
+        "-p", "--port", type=int, default=DEFAULT_PORT, help=f"bind port (default: {DEFAULT_PORT})"
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=REFRESH_INTERVAL,
+        help=f"seconds between upstream refreshes (default: {REFRESH_INTERVAL})",
+    )
+    add_source_args(parser)
+    return parser
+
+
+async def rank_trackers(trackers: list[str], concurrency: int, timeout: float) -> list[str]:
+    start = time.perf_counter()
+    alive = await probe_all(trackers, max(1, concurrency), timeout)
+    elapsed = time.perf_counter() - start
+    print(f"Probed {len(trackers)} trackers in {elapsed:.1f}s: {len(alive)} alive")
+    if not alive:
+        # 全部失败多半是本机网络问题 (例如 UDP 被屏蔽), 保留原列表而不是写空文件
+        print("Warning: no tracker answered, keeping the unprobed list", file=sys.stderr)
+        return trackers
+    return [url for url, _ in alive]
+
+
+async def collect(args, cache: SourceCache | None) -> list[str]:
+    trackers = await get_tracker_list(cache)
+    if trackers and not args.no_probe:
+        trackers = await rank_trackers(trackers, args.probe_concurrency, args.probe_timeout)
+    return trackers
+
+
 def cli():
     asyncio.run(main())
 
 
+async def serve(args):
+    cache = None if args.no_cache else SourceCache()
+    try:
+        if cache is not None and args.clear_cache:
+            cache.clear()
+        server = TrackerListServer(lambda: collect(args, cache), max(1.0, args.interval))
+        await server.serve(args.host, args.port)
+    except OSError as err:
+        print(f"Error: {err}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
 async def main():
-    work_dir = get_folder()
+    # `qtracker serve ...` 启动本地服务, 否则保持原来的 `qtracker DIR` 用法
+    if sys.argv[1:2] == ["serve"]:
+        await serve(get_serve_parser().parse_args(sys.argv[2:]))
+        return
+
+    args = get_args_parser().parse_args()
+    work_dir = get_folder(args.folder)
     track_output = work_dir / "tracker.txt"
+
+    cache = None if args.no_cache else SourceCache()
     try:
-        trackers = await get_tracker_list()
+        if cache is not None and args.clear_cache:
+            cache.clear()
+        trackers = await collect(args, cache)
+        if not trackers:
+            print("Error: no trackers from any source", file=sys.stderr)
+            sys.exit(1)
         save_to_file(trackers, track_output)
         print(f"Tracker list saved to: {track_output}")
+        if cache is not None:
+            print(f"Cache: {cache.stats()}")
     except Exception as err:
         print(f"Error: {err}")
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
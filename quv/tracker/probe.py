@@ -0,0 +1,109 @@
+import asyncio
+import os
+import random
+import struct
+import time
+from urllib.parse import quote_from_bytes, urlsplit
+
+import httpx
+
+PROBE_TIMEOUT = 5.0
+PROBE_CONCURRENCY = 64
+# BEP 15: connect 请求的固定 protocol_id
+UDP_PROTOCOL_ID = 0x41727101980
+UDP_ACTION_CONNECT = 0
+
+
+class _ConnectProtocol(asyncio.DatagramProtocol):
+    def __init__(self, transaction_id: int):
+        self.transaction_id = transaction_id
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def datagram_received(self, data, addr):
+        if len(data) < 16 or self.done.done():
+            return
+        action, transaction_id = struct.unpack_from("!II", data)
+        if action == UDP_ACTION_CONNECT and transaction_id == self.transaction_id:
+            self.done.set_result(data[8:16])
+
+    def error_received(self, exc):
+        if not self.done.done():
+            self.done.set_exception(exc)
+
+
+async def probe_udp(url: str, timeout: float = PROBE_TIMEOUT) -> float:
+    # 发送 BEP 15 connect 请求, 收到匹配的 connection_id 即视为存活
+    parts = urlsplit(url)
+    if not parts.hostname or not parts.port:
+        raise ValueError(f"invalid udp tracker: {url}")
+    loop = asyncio.get_running_loop()
+    transaction_id = random.getrandbits(32)
+    start = time.perf_counter()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _ConnectProtocol(transaction_id), remote_addr=(parts.hostname, parts.port)
+    )
+    try:
+        transport.sendto(struct.pack("!QII", UDP_PROTOCOL_ID, UDP_ACTION_CONNECT, transaction_id))
+        await asyncio.wait_for(protocol.done, timeout)
+    finally:
+        transport.close()
+    return time.perf_counter() - start
+
+
+async def probe_http(client: httpx.AsyncClient, url: str) -> float:
+    # 用随机 info_hash 发一次 announce, 只要返回 bencode 字典 (包括 failure reason) 即视为存活
+    params = (
+        f"info_hash={quote_from_bytes(os.urandom(20))}"
+        f"&peer_id={quote_from_bytes(b'-QV0001-' + os.urandom(12))}"
+        "&port=6881&uploaded=0&downloaded=0&left=0&compact=1&numwant=0"
+    )
+    sep = "&" if "?" in url else "?"
+    start = time.perf_counter()
+    resp = await client.get(f"{url}{sep}{params}")
+    if resp.status_code != 200 or not resp.content.startswith(b"d"):
+        raise ValueError(f"unexpected announce response: {resp.status_code}")
+    return time.perf_counter() - start
+
+
+async def probe_tcp(url: str, timeout: float = PROBE_TIMEOUT) -> float:
+    parts = urlsplit(url)
+    if not parts.hostname or not parts.port:
+        raise ValueError(f"invalid tcp tracker: {url}")
+    start = time.perf_counter()
+    _, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port), timeout)
+    writer.close()
+    return time.perf_counter() - start
+
+
+async def probe_all(
+    trackers: list[str],
+    concurrency: int = PROBE_CONCURRENCY,
+    timeout: float = PROBE_TIMEOUT,
+) -> list[tuple[str, float]]:
+    # 全局信号量限制并发, 每个探测单独超时; 返回存活的 (url, 延迟秒), 按延迟升序
+    sem = asyncio.Semaphore(concurrency)
+
+    async def probe_one(client: httpx.AsyncClient, url: str) -> tuple[str, float | None]:
+        # 格式错误的 URL (ValueError / httpx.InvalidURL) 只算该 tracker 失败, 不影响整轮探测
+        async with sem:
+            try:
+                scheme = urlsplit(url).scheme.lower()
+                if scheme == "udp":
+                    probe = probe_udp(url, timeout)
+                elif scheme in ("http", "https"):
+                    probe = probe_http(client, url)
+                else:
+                    probe = probe_tcp(url, timeout)
+                # 外层超时同时覆盖 DNS 解析
+                latency = await asyncio.wait_for(probe, timeout)
+            except (OSError, ValueError, TimeoutError, httpx.HTTPError, httpx.InvalidURL):
+                latency = None
+        return url, latency
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        results = await asyncio.gather(*(probe_one(client, url) for url in trackers))
+
+    alive = [(url, latency) for url, latency in results if latency is not None]
+    alive.sort(key=lambda item: (item[1], item[0]))
+    return alive
@@ -0,0 +1,197 @@
+import asyncio
+import gzip
+import hashlib
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from email.utils import formatdate
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8787
+REFRESH_INTERVAL = 3600
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT = 30.0
+PATHS = ("/", "/tracker.txt")
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    # 按 q 值判断, gzip;q=0 表示明确拒绝; 没有列出 gzip 时看 *
+    qvalues = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            qvalues[coding.lower()] = q
+    q = qvalues.get("gzip", qvalues.get("x-gzip", qvalues.get("*", 0.0)))
+    return q > 0
+
+
+class TrackerListServer:
+    # 内存中保存合并后的列表, 后台定时刷新; 正文, gzip 正文和 ETag 在刷新时一次算好
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[list[str]]],
+        interval: float = REFRESH_INTERVAL,
+    ):
+        self.fetch = fetch
+        self.interval = interval
+        self.body = b""
+        self.gzip_body = b""
+        self.etag = ""
+        self.gzip_etag = ""
+        self.last_modified = ""
+        self.requests = 0
+        self.not_modified = 0
+
+    def update(self, trackers: list[str]) -> bool:
+        body = "\r\n".join(trackers).encode("utf-8")
+        if body == self.body:
+            return False
+        self.body = body
+        self.gzip_body = gzip.compress(body, mtime=0)
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # gzip 正文与原文字节不同, 使用各自的强 ETag
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+        self.last_modified = formatdate(usegmt=True)
+        return True
+
+    async def refresh(self) -> None:
+        start = time.perf_counter()
+        try:
+            trackers = await self.fetch()
+        except Exception as err:
+            print(f"refresh error: {err}", file=sys.stderr)
+            return
+        if not trackers:
+            # 保留上一次的列表
+            print("refresh returned no trackers, keeping the current list", file=sys.stderr)
+            return
+        changed = self.update(trackers)
+        elapsed = time.perf_counter() - start
+        state = "changed" if changed else "unchanged"
+        print(
+            f"refreshed {len(trackers)} trackers in {elapsed:.1f}s ({state}), "
+            f"served {self.requests} requests, {self.not_modified} not modified",
+            file=sys.stderr,
+        )
+
+    async def refresh_loop(self) -> None:
+        # 先监听再做首次刷新, 刷新完成前请求收到 503
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def respond(self, method: str, path: str, headers: dict[str, str]) -> tuple[int, dict, bytes]:
+        if method not in ("GET", "HEAD"):
+            return 405, {"Allow": "GET, HEAD"}, b""
+        if path.split("?", 1)[0] not in PATHS:
+            return 404, {}, b""
+        if not self.body:
+            return 503, {"Retry-After": "60"}, b""
+
+        use_gzip = accepts_gzip(headers.get("accept-encoding", ""))
+        etag = self.gzip_etag if use_gzip else self.etag
+        out = {
+            "ETag": etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        # 客户端带着当前 ETag 轮询时只回 304, 不发送正文
+        if_none_match = headers.get("if-none-match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            self.not_modified += 1
+            return 304, out, b""
+
+        body = self.body
+        if use_gzip:
+            out["Content-Encoding"] = "gzip"
+            body = self.gzip_body
+        out["Content-Type"] = "text/plain; charset=utf-8"
+        return 200, out, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, TimeoutError):
+                    return
+
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split()
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                # 请求正文没有用处, 但必须读掉, 否则 keep-alive 时会被当成下一个请求;
+                # 分块编码或过大的正文直接关闭连接
+                length = headers.get("content-length", "0")
+                discard = int(length) if length.isdigit() else -1
+                if "transfer-encoding" in headers or not 0 <= discard <= MAX_BODY_BYTES:
+                    parts = []
+                elif discard:
+                    try:
+                        await asyncio.wait_for(reader.readexactly(discard), IDLE_TIMEOUT)
+                    except (asyncio.IncompleteReadError, TimeoutError):
+                        return
+
+                if len(parts) != 3:
+                    status, out, body = 400, {}, b""
+                    keep_alive = False
+                else:
+                    method, path, version = parts
+                    self.requests += 1
+                    status, out, body = self.respond(method, path, headers)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = status != 405 and (
+                        connection != "close"
+                        if version == "HTTP/1.1"
+                        else connection == "keep-alive"
+                    )
+
+                out["Content-Length"] = str(len(body))
+                out["Connection"] = "keep-alive" if keep_alive else "close"
+                lines = [f"HTTP/1.1 {status} {REASONS[status]}"]
+                lines += [f"{name}: {value}" for name, value in out.items()]
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+                if parts and parts[0] != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        addrs = ", ".join(f"{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+        print(f"serving tracker list on http://{addrs}/ (refresh every {self.interval}s)")
+        refresher = asyncio.create_task(self.refresh_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refresher.cancel()
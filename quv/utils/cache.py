@@ -0,0 +1,14 @@
+import os
+import sys
+from pathlib import Path
+
+
+def cache_dir(*parts: str) -> Path:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+
+    path = Path(base, "quv", *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+LATENCY_FACTOR = 3.0
+OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+
+
+class Slot:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttfb: float | None = None
+        self.status: int | None = None
+        self.nbytes = 0
+
+    def mark_response(self, status: int) -> None:
+        self.ttfb = time.perf_counter() - self.start
+        self.status = status
+
+
+class HostLimiter:
+    # AIMD: 一个窗口 (limit 个请求) 内全部正常则 +1, 出现 429/5xx/错误或首字节延迟
+    # 超过最小延迟的 LATENCY_FACTOR 倍则减半, 每个 RTT 最多减半一次
+    def __init__(
+        self, initial: int = INITIAL_LIMIT, min_limit: int = MIN_LIMIT, max_limit: int = MAX_LIMIT
+    ):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.min_latency: float | None = None
+        self._cond = asyncio.Condition()
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._last_rate = 0.0
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, slot: Slot, ok: bool) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._update(slot, ok)
+            self._cond.notify_all()
+
+    def _update(self, slot: Slot, ok: bool) -> None:
+        now = time.perf_counter()
+        latency = slot.ttfb
+        if ok and latency is not None:
+            # 最小延迟缓慢上浮, 网络环境变化后基线可以跟上
+            base = self.min_latency
+            self.min_latency = latency if base is None else min(latency, base * 1.05)
+
+        overloaded = not ok or slot.status in OVERLOAD_STATUS
+        slow = (
+            latency is not None
+            and self.min_latency is not None
+            and latency > self.min_latency * LATENCY_FACTOR
+        )
+        if overloaded or slow:
+            if now - self._last_decrease > (self.min_latency or 1.0):
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+            self._reset_window(now)
+            return
+
+        self._successes += 1
+        self._window_bytes += slot.nbytes
+        if self._successes >= int(self.limit):
+            elapsed = now - self._window_start
+            rate = self._window_bytes / elapsed if elapsed > 0 else 0.0
+            # 吞吐量没有下降才继续加窗口, 否则保持当前并发
+            if rate >= self._last_rate * 0.9:
+                self.limit = min(self.max_limit, self.limit + 1)
+            self._last_rate = rate
+            self._reset_window(now)
+
+    def _reset_window(self, now: float) -> None:
+        self._successes = 0
+        self._window_bytes = 0
+        self._window_start = now
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self, initial: int = INITIAL_LIMIT, min_limit: int = MIN_LIMIT, max_limit: int = MAX_LIMIT
+    ):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.hosts: dict[str, HostLimiter] = {}
+
+    def host(self, url: str) -> HostLimiter:
+        netloc = urlparse(url).netloc
+        limiter = self.hosts.get(netloc)
+        if limiter is None:
+            limiter = HostLimiter(self.initial, self.min_limit, self.max_limit)
+            self.hosts[netloc] = limiter
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        limiter = self.host(url)
+        await limiter.acquire()
+        slot = Slot()
+        try:
+            yield slot
+        except BaseException:
+            # 拿到了非过载响应 (如 404) 的失败不算拥塞
+            await limiter.release(slot, slot.status is not None)
+            raise
+        await limiter.release(slot, True)
+
+    def stats(self) -> str:
+        return ", ".join(f"{host}: limit={int(h.limit)}" for host, h in sorted(self.hosts.items()))
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ("httpx", "aiofiles", "blake3", "pymdp", "sqlite3")
+# 冷启动的宽松上限 (微秒), 本机约 50 ms
+MAX_IMPORT_US = 500_000
+
+
+def test_qbox_import_is_lazy():
+    pytest.importorskip("tkinter")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import quv.box.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # 每行格式: "import time: self [us] | cumulative | imported package"
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative)
+
+    loaded = {name.split(".")[0] for name in timings}
+    assert not loaded & set(HEAVY_MODULES)
+    assert timings["quv.box.main"] < MAX_IMPORT_US
@@ -0,0 +1,74 @@
+import asyncio
+import socket
+import struct
+
+from quv.tracker.probe import UDP_ACTION_CONNECT, UDP_PROTOCOL_ID, probe_all
+
+
+class UdpTracker(asyncio.DatagramProtocol):
+    # BEP 15 connect 应答, delay 秒后回复
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        protocol_id, action, transaction_id = struct.unpack("!QII", data[:16])
+        if protocol_id != UDP_PROTOCOL_ID or action != UDP_ACTION_CONNECT:
+            return
+        reply = struct.pack("!IIQ", UDP_ACTION_CONNECT, transaction_id, 0x1234)
+        asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, reply, addr)
+
+
+async def http_tracker(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # announce 的替身: 延迟后返回 bencode 的 failure reason
+    await reader.readuntil(b"\r\n\r\n")
+    await asyncio.sleep(0.3)
+    body = b"d14:failure reason7:unknowne"
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body))
+    await writer.drain()
+    writer.close()
+
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_probe():
+    loop = asyncio.get_running_loop()
+    fast, _ = await loop.create_datagram_endpoint(lambda: UdpTracker(), local_addr=("127.0.0.1", 0))
+    slow, _ = await loop.create_datagram_endpoint(
+        lambda: UdpTracker(0.15), local_addr=("127.0.0.1", 0)
+    )
+    server = await asyncio.start_server(http_tracker, "127.0.0.1", 0)
+    fast_url = f"udp://127.0.0.1:{fast.get_extra_info('sockname')[1]}/announce"
+    slow_url = f"udp://127.0.0.1:{slow.get_extra_info('sockname')[1]}/announce"
+    http_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/announce"
+    dead = closed_port()
+    trackers = [
+        http_url,
+        slow_url,
+        f"tcp://127.0.0.1:{dead}/announce",
+        f"udp://127.0.0.1:{dead}/announce",
+        "http://[bad/announce",
+        f"http://127.0.0.1:{dead}/ann\x01ounce",
+        fast_url,
+    ]
+    try:
+        async with server:
+            alive = await probe_all(trackers, concurrency=8, timeout=1.0)
+    finally:
+        fast.close()
+        slow.close()
+    return alive, [fast_url, slow_url, http_url]
+
+
+def test_probe_all_ranks_alive_trackers_by_latency():
+    alive, expected = asyncio.run(run_probe())
+    assert [url for url, _ in alive] == expected
+    latencies = [latency for _, latency in alive]
+    assert latencies == sorted(latencies)
+    assert latencies[-1] >= 0.3